@@ -1,12 +1,22 @@
 import gpiozero
+import threading
 import time
+from collections import deque
+
+# nejdelší čekání na uvolnění tlačítek při stop() (s)
+STOP_QUIET_TIMEOUT = 0.2
 
 class Keypad:
     def __init__(self, pinNumbers: list[int]):
         self.buttons = [gpiozero.Button(pin, bounce_time=0.1) for pin in pinNumbers]
         for index, button in enumerate(self.buttons):
             button.when_pressed = lambda ind=index: self.__handle_key_press(ind)
-        self.__key_press = [False] * len(pinNumbers)
+        # bitová maska stisknutých tlačítek (bit i = tlačítko i); mění ji jen konzument (was_pressed)
+        self.__key_mask = 0
+        # fronta indexů stisknutých tlačítek - callback jen přidává (deque.append je atomický)
+        self.__events: deque[int] = deque()
+        # probuzení čekajícího konzumenta (wait) při stisku tlačítka nebo požadavku na ukončení (wake)
+        self.__wakeup = threading.Event()
 
     def stop(self):
         # 1) odregistrovat všechny callbacky
@@ -18,21 +28,30 @@ class Keypad:
             except Exception:
                 pass
 
-        # 2) krátce počkat aby backend dokončil právě probíhající zpracování eventů
-        #    a případně počkat na uvolnění tlačítka
-        for b in self.buttons:
+        # 2) případně počkat na uvolnění tlačítek (nejvýše STOP_QUIET_TIMEOUT pro všechna dohromady)
+        self.wait_quiet(STOP_QUIET_TIMEOUT)
+
+    """
+    Počká, dokud nejsou všechna tlačítka uvolněná, nejvýše však timeout (jeden společný termín pro všechna).
+    Pokud žádné tlačítko stisknuté není, vrátí se hned.
+
+    Args:
+        timeout: Maximální doba čekání v sekundách
+    Returns:
+        True, pokud jsou všechna tlačítka uvolněná, jinak False (vypršel timeout)
+    """
+    def wait_quiet(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while True:
             try:
-                # wait_for_release je blokující s timeoutem, bezpečné použít krátký timeout
-                b.wait_for_release(timeout=0.1)
+                if not any(b.is_active for b in self.buttons):
+                    return True
             except Exception:
-                # ignorovat timeout/chyby — jen dáváme šanci backendu dokončit
-                pass
-
-        # ještě malá dodatečná prodleva
-        try:
-            time.sleep(0.08)
-        except Exception:
-            pass
+                # tlačítko už může být zavřené - není na co čekat
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
 
     def close(self):
         # Odregistrovat callbacky
@@ -47,15 +66,57 @@ class Keypad:
         self.buttons = []
 
         # reset interního stavu kláves
-        try: self.__key_press = [False] * len(self.__key_press)
-        except Exception: self.__key_press = []
+        self.__key_mask = 0
+        self.__events.clear()
 
     """
     Pomocná metoda pro zapamatování stisknutí tlačítka. 
     Volaná je v lambda funkci pro událost stisknutí tlačítka. Událost je zaregistrována v konstruktoru.
     """
     def __handle_key_press(self, index: int) -> None:
-        self.__key_press[index] = True
+        self.__events.append(index)
+        self.__wakeup.set()
+
+
+    """
+    Čekání na stisk tlačítka (místo pravidelného dotazování)
+    Vrátí se hned po stisku, po zavolání wake() nebo po uplynutí timeoutu.
+
+    Args:
+        timeout: Maximální doba čekání v sekundách
+    Returns:
+        True, pokud čeká nějaký nezpracovaný stisk, jinak False
+    """
+    def wait(self, timeout: float) -> bool:
+        self.__wakeup.wait(timeout)
+        # clear před zpracováním - stisk, který přijde mezitím, znovu nastaví event
+        self.__wakeup.clear()
+        return self.any_pressed()
+
+
+    """
+    Probuzení konzumenta čekajícího ve wait() (např. ze signal handleru při ukončení)
+    """
+    def wake(self) -> None:
+        self.__wakeup.set()
+
+
+    """
+    Zjištění, zda čeká nějaký dosud nezpracovaný stisk (libovolného tlačítka)
+
+    Returns:
+        True, pokud čeká alespoň jeden stisk, jinak False
+    """
+    def any_pressed(self) -> bool:
+        return bool(self.__events) or self.__key_mask != 0
+
+
+    """
+    Přesun čekajících událostí z fronty do bitové masky tlačítek (pro was_pressed)
+    """
+    def __drain_events(self) -> None:
+        while self.__events:
+            self.__key_mask |= 1 << self.__events.popleft()
 
 
     """
@@ -70,8 +131,10 @@ class Keypad:
     """
     def was_pressed(self, index: int) -> bool:
         if 0 <= index < len(self.buttons):
-            pressed = self.__key_press[index]
-            self.__key_press[index] = False
+            self.__drain_events()
+            bit = 1 << index
+            pressed = (self.__key_mask & bit) != 0
+            self.__key_mask &= ~bit
             return pressed
         else:
             raise ValueError(f"Key number must be between 0 and {len(self.buttons) - 1}")
@@ -2,14 +2,35 @@ import csv
 import time
 import board
 import signal
+from concurrent.futures import Future, ThreadPoolExecutor
 from keypad import Keypad
-from typing import Any, Optional
+from typing import Any, Iterable, Optional, Sequence
 from gpiozero import LED, OutputDevice
 from adafruit_dht import DHT11, DHTBase
 from sqlSensorData import SqlSensorData
 
 # Identifikátory senzorů
-SENSOR_IDS = ["DHT11_01", "DHT11_02"]
+SENSOR_IDS = ("DHT11_01", "DHT11_02")
+
+# Perioda měření v sekundách (DHT11 zvládne nejvýše jedno čtení za ~1-2 s)
+MEASURE_INTERVAL = 3.0
+
+# Velikost bufferu pro zápis CSV exportu (méně systémových volání write)
+EXPORT_BUFFER_SIZE = 1 << 20
+
+# Export agregovaných dat po hodinách za posledních 24 hodin (klávesa 0) - sloupce a podmínky dotazu
+EXPORT24_COLUMNS = (
+    "sensor_id, "
+    "strftime('%Y-%m-%d %H', timestamp) AS hour, "
+    "ROUND(AVG(temperature), 1) AS avg_temp, "
+    "MIN(temperature) AS min_temp, "
+    "MAX(temperature) AS max_temp, "
+    "COUNT(*) AS record_count"
+)
+# sensor_id IN (...) -> SQLite projde jen rozsahy indexu idx_sensor_ts místo celé tabulky
+EXPORT24_WHERE = f"sensor_id IN ({', '.join('?' * len(SENSOR_IDS))}) AND timestamp >= datetime('now', '-1 day')"
+EXPORT24_GROUP_BY = "sensor_id, strftime('%Y-%m-%d %H', timestamp)"
+EXPORT24_ORDER_BY = "sensor_id ASC, hour ASC"
 
 #relay = OutputDevice(23, active_high=True, initial_value=False)  # LED na GPIO pin 23
 #rele2 = OutputDevice(24, active_high=True, initial_value=False)  # LED na GPIO pin 24
@@ -24,6 +45,8 @@ class SensorsMeasureApp:
         self.__heartbeat_led = LED(27)                      # LED na GPIO pin 27
         self.__dhtDevice1 = DHT11(board.D17)                # DHT11 na GPIO pin 17
         self.__dhtDevice2 = DHT11(board.D22)                # DHT11 na GPIO pin 22
+        # čtení obou senzorů běží souběžně (každé čtení DHT11 blokuje ~1 s), zápis do DB zůstává v hlavním vlákně
+        self.__read_pool = ThreadPoolExecutor(max_workers=len(SENSOR_IDS), thread_name_prefix="dht")
         self.__keypad = Keypad([16, 20, 21])                # Klávesnice z GPIO pinů 16 (key0), 20 (key1), 21 (key2)
         self.__sql = SqlSensorData("../data_db/sensors.db")    # SQLite databáze sensors.db s tabulkou sensor_data
 
@@ -34,19 +57,23 @@ class SensorsMeasureApp:
     def signal_handler(self, sig, frame):
             print(f"Signal {sig} received. Stopping app.")
             self.running = False
+            # probudit čekání na klávesnici, ať smyčka skončí hned
+            keypad = getattr(self, "_SensorsMeasureApp__keypad", None)
+            if keypad is not None:
+                keypad.wake()
 
     """
     Provedeni exportu do CSV
 
     Args:
         fileName: Název CSV souboru
-        rows: Data řádků pro export
+        rows: Data řádků pro export - libovolný iterovatelný objekt (i generátor), zapisuje se průběžně
         headerColumnNames: Sloupce záhlaví (volitelné) - pokud není zadáno, záhlaví nebude zahrnuto
     Returns:
         None
     """
-    def __exportCsv(self, fileName: str, rows: list[list[Any]], headerColumnNames: Optional[list[str]] = None) -> None:
-        with open(file=fileName, mode='w', newline='') as file:
+    def __exportCsv(self, fileName: str, rows: Iterable[Sequence[Any]], headerColumnNames: Optional[list[str]] = None) -> None:
+        with open(file=fileName, mode='w', newline='', buffering=EXPORT_BUFFER_SIZE, encoding='utf-8') as file:
             writer = csv.writer(file, strict=True)
             if headerColumnNames is not None:               # pokud máme sloupce záhlaví
                 writer.writerow(headerColumnNames)          #   zapíšene záhlaví do exportu
@@ -63,48 +90,46 @@ class SensorsMeasureApp:
     key 2: Ukončit skript
     """
     def __keypad_action(self):
+        # žádný stisk nečeká -> nic dalšího nekontrolujeme
+        if not self.__keypad.any_pressed():
+            return
+
         # bylo stisknuto tlačítko 0?
         if self.__keypad.was_pressed(0):
-            # projdi jednotlive senzory
-            for sensor_id in SENSOR_IDS:
-                """ Do konzole vypíšeme počet záznamů, průměrnou, minimální a maximální teplotu za poslední hodinu """
-                # WHERE podmínka pro konkrétní senzor a poslední hodinu
-                where = f"sensor_id = '{sensor_id}' AND timestamp >= datetime('now', '-1 hour')"
-                print("{} - Total records: {}, Temperature Avg: {:.1f}°C, Min: {:.1f}°C, Max: {:.1f}°C".format(
-                    sensor_id,
-                    self.__sql.count(where_clause=where),
-                    self.__sql.get_average_temperature(where_clause=where),
-                    self.__sql.get_min_temperature(where_clause=where),
-                    self.__sql.get_max_temperature(where_clause=where),
-                ))
-
-            """ Export agregovaných dat z jednoho senzoru po hodinách za 1 den (za 24 hodin) do CSV souboru """
-            columns = (
-                "sensor_id, "
-                "strftime('%Y-%m-%d %H', timestamp) AS hour, "
-                "ROUND(AVG(temperature), 1) AS avg_temp, "
-                "MIN(temperature) AS min_temp, "
-                "MAX(temperature) AS max_temp, "
-                "COUNT(*) AS record_count"
-            )
-            self.__exportCsv(
-                fileName="../exports/export24.csv",
-                rows=self.__sql.execute_select_get_all(
-                    columns=columns,
-                    where_clause=f"timestamp >= datetime('now', '-1 day')",
-                    group_by="sensor_id, strftime('%Y-%m-%d %H', timestamp)",
-                    order_by="sensor_id ASC, hour ASC",
-                ),
-                headerColumnNames=self.__sql.get_column_names(columns=columns),
-            )
+            # statistiky i export jednou čtecí transakcí (jeden snapshot dat pro všechny dotazy)
+            with self.__sql.read_transaction():
+                # projdi jednotlive senzory
+                for sensor_id in SENSOR_IDS:
+                    """ Do konzole vypíšeme počet záznamů, průměrnou, minimální a maximální teplotu za poslední hodinu """
+                    # WHERE podmínka pro konkrétní senzor a poslední hodinu
+                    where = "sensor_id = ? AND timestamp >= datetime('now', '-1 hour')"
+                    # počet, průměr, minimum i maximum jedním průchodem dat (jeden dotaz místo čtyř)
+                    count, avg_temp, min_temp, max_temp = self.__sql.get_stats(where_clause=where, params=(sensor_id,))
+                    print("{} - Total records: {}, Temperature Avg: {:.1f}°C, Min: {:.1f}°C, Max: {:.1f}°C".format(
+                        sensor_id, count, avg_temp, min_temp, max_temp,
+                    ))
+
+                """ Export agregovaných dat z jednoho senzoru po hodinách za 1 den (za 24 hodin) do CSV souboru """
+                self.__exportCsv(
+                    fileName="../exports/export24.csv",
+                    rows=self.__sql.execute_select_iter(
+                        columns=EXPORT24_COLUMNS,
+                        where_clause=EXPORT24_WHERE,
+                        params=SENSOR_IDS,
+                        group_by=EXPORT24_GROUP_BY,
+                        order_by=EXPORT24_ORDER_BY,
+                    ),
+                    headerColumnNames=self.__sql.get_column_names(columns=EXPORT24_COLUMNS),
+                )
 
         # bylo stisknuto tlačítko 1?
         if self.__keypad.was_pressed(1):
             """ Export všech dat z jednoho senzoru za poslední hodinu do CSV souboru """
             self.__exportCsv(
                 fileName="../exports/export1.csv",
-                rows=self.__sql.execute_select_get_all(
-                    where_clause=f"sensor_id = '{SENSOR_IDS[1]}' AND timestamp >= datetime('now', '-1 hour')",
+                rows=self.__sql.execute_select_iter(
+                    where_clause="sensor_id = ? AND timestamp >= datetime('now', '-1 hour')",
+                    params=(SENSOR_IDS[1],),
                     order_by="timestamp ASC",
                 ), 
                 headerColumnNames=self.__sql.get_column_names(),
@@ -125,15 +150,15 @@ class SensorsMeasureApp:
             print("\nKey 2 pressed. Stopping app.")
             self.running = False
 
-    def __sensor_DHT_measure(self, sensor_id: str, dhtDevice: DHTBase) -> None:
-        try:
-            # Čtení dat ze senzoru
-            temperature = dhtDevice.temperature
-            humidity = dhtDevice.humidity
+    # Čtení dat ze senzoru (běží ve vlákně __read_pool)
+    def __sensor_DHT_read(self, dhtDevice: DHTBase) -> tuple[Optional[float], Optional[float]]:
+        return dhtDevice.temperature, dhtDevice.humidity
 
-            # Ukládání dat do DB
-            if temperature is not None:
-                self.__sql.insert_data(sensor_id, temperature, humidity)
+    # Zpracování výsledku čtení: výpis do konzole; vrací řádek pro uložení do DB (nebo None)
+    def __sensor_DHT_measure(self, sensor_id: str, reading: "Future[tuple[Optional[float], Optional[float]]]") -> Optional[tuple[str, float, Optional[float]]]:
+        try:
+            # Výsledek čtení ze senzoru (případná chyba čtení se vyhodí zde)
+            temperature, humidity = reading.result()
 
             # Výpis do konzole
             temperature_str = f"{temperature:.1f}°C" if temperature is not None else "N/A"
@@ -143,10 +168,15 @@ class SensorsMeasureApp:
                 log_str += " - Data not inserted."               
             print(log_str)
 
+            # Data pro uložení do DB
+            if temperature is not None:
+                return (sensor_id, temperature, humidity)
+
         except Exception as ex:
             # V případě chyby vypíšeme chybové hlášení a počkáme 2 sekundy před dalším pokusem
             print(f"Error occurred: {ex}")
             time.sleep(2)
+        return None
 
     def cleanup(self) -> None:
         if getattr(self, "_SensorsMeasureApp__cleaned", False):
@@ -154,9 +184,7 @@ class SensorsMeasureApp:
             return
         self.__cleaned = True
 
-        print("cleanup: start - waiting")
-        time.sleep(1)
-        print("cleanup: wait ending")
+        print("cleanup: start")
 
         # Keypad
         try:
@@ -174,11 +202,17 @@ class SensorsMeasureApp:
                         kp.deinit()
                     except Exception as e:
                         print(f"cleanup: keypad.deinit() failed: {e}")
-            time.sleep(0.05)
         except Exception as e:
             print(f"cleanup: keypad block error: {e}")
-        
-        time.sleep(0.08)
+
+        # Vlákna pro čtení senzorů
+        try:
+            pool = getattr(self, "_SensorsMeasureApp__read_pool", None)
+            if pool is not None:
+                print("cleanup: read_pool.shutdown()")
+                pool.shutdown(wait=True, cancel_futures=True)
+        except Exception as e:
+            print(f"cleanup: read_pool block error: {e}")
 
         # LED
         try:
@@ -192,7 +226,6 @@ class SensorsMeasureApp:
                         self.__heartbeat_led.close()
                     except Exception as e:
                         print(f"cleanup: led.close() failed: {e}")
-            time.sleep(0.05)
         except Exception as e:
             print(f"cleanup: led block error: {e}")
 
@@ -204,7 +237,6 @@ class SensorsMeasureApp:
                     self.__sql.close()
                 except Exception as e:
                     print(f"cleanup: sql.close() failed: {e}")
-            time.sleep(0.05)
         except Exception as e:
             print(f"cleanup: sql block error: {e}")
 
@@ -222,11 +254,6 @@ class SensorsMeasureApp:
             except Exception: pass
         except Exception:
             pass
-        # Dajíme malou prodlevu, aby backend dokončil teardown
-        try:
-            time.sleep(0.20)
-        except Exception:
-            pass
 
         print("cleanup: finished")
 
@@ -235,19 +262,30 @@ class SensorsMeasureApp:
         # dokud máme běžet, tak čteme data ze senzoru, ukládáme je do DB a vypisujeme do konzole
         while self.running:
             try:
+                # čas dalšího čtení počítáme od začátku cyklu, aby doba čtení senzorů neprodlužovala periodu
+                next_read = time.monotonic() + MEASURE_INTERVAL
+
                 self.__heartbeat_led.on()
 
-                for sensor_id, dhtDevice in zip(SENSOR_IDS, [self.__dhtDevice1, self.__dhtDevice2]):
-                    self.__sensor_DHT_measure(sensor_id, dhtDevice)
+                # oba senzory čteme souběžně, výsledky pak postupně uložíme (SQLite spojení patří hlavnímu vláknu)
+                readings = [
+                    (sensor_id, self.__read_pool.submit(self.__sensor_DHT_read, dhtDevice))
+                    for sensor_id, dhtDevice in zip(SENSOR_IDS, [self.__dhtDevice1, self.__dhtDevice2])
+                ]
+                rows = [self.__sensor_DHT_measure(sensor_id, reading) for sensor_id, reading in readings]
+
+                # Ukládání dat do DB - všechny senzory jednou transakcí
+                self.__sql.insert_many([row for row in rows if row is not None])
                     
                 self.__heartbeat_led.off()
 
-                # během 3 sekund (30 desetin) kontrolujeme stisky tlačítek a čekáme před dalším čtením
-                for _ in range(30):
-                    self.__keypad_action()
-                    time.sleep(0.1)
-#                    if not self.running:
-#                        break
+                # do dalšího čtení čekáme na stisk tlačítka (probudí nás callback klávesnice nebo signál)
+                while self.running:
+                    remaining = next_read - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    if self.__keypad.wait(remaining):
+                        self.__keypad_action()
                         
             except Exception as ex:
                 # V případě chyby vypíšeme chybové hlášení a počkáme 2 sekundy před dalším pokusem
@@ -1,5 +1,15 @@
 import sqlite3
-from typing import Any, Optional
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional, Sequence
+
+# PRAGMA pro spojení měřícího skriptu: WAL (čtení webu neblokuje zápis), NORMAL sync (ve WAL bez fsync
+# při každém commitu, stále odolné proti pádu), dočasné tabulky v paměti a čtení souboru přes mmap (64 MB)
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=67108864",
+)
 
 class SqlSensorData:
     """
@@ -10,6 +20,10 @@ class SqlSensorData:
     """
     def __init__(self, db_name: str):
         self.conn = sqlite3.connect(db_name)
+        # cache názvů sloupců pro get_column_names (columns -> názvy)
+        self.__column_names: dict[str, list[str]] = {}
+        for pragma in CONNECTION_PRAGMAS:
+            self.conn.execute(pragma)
         self.__create_tables()
 
     def __del__(self):
@@ -35,6 +49,17 @@ class SqlSensorData:
             )
         ''')
 
+        # Index pro dotazy webu (jeden senzor + časové rozmezí) - místo průchodu celé tabulky jen rozsah indexu
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_sensor_ts ON sensor_data (sensor_id, timestamp)
+        ''')
+
+        # Čas měření jako unix epoch - web podle něj seskupuje agregace celočíselně (bez strftime na každý řádek)
+        columns = [row[1] for row in cursor.execute('PRAGMA table_info(sensor_data)')]
+        if 'ts_epoch' not in columns:
+            cursor.execute('ALTER TABLE sensor_data ADD COLUMN ts_epoch INTEGER')
+            cursor.execute("UPDATE sensor_data SET ts_epoch = CAST(strftime('%s', timestamp) AS INTEGER)")
+
         # Aktuální data (jeden řádek na senzor)
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS current_sensor_data (
@@ -67,6 +92,28 @@ class SqlSensorData:
     def close(self) -> None:
         self.conn.close()
 
+    """
+    Čtecí transakce pro více SELECT dotazů za sebou (with sql.read_transaction(): ...)
+    SQLite vezme snapshot dat jen jednou a všechny dotazy uvnitř vidí stejná data.
+    Generátory (execute_select_iter) je nutné dočerpat uvnitř bloku.
+    Pokud už transakce běží, jen se do ní vnoří.
+
+    Args:
+        None
+    Returns:
+        Context manager
+    """
+    @contextmanager
+    def read_transaction(self) -> Iterator[None]:
+        if self.conn.in_transaction:
+            yield
+            return
+        self.conn.execute('BEGIN')
+        try:
+            yield
+        finally:
+            self.conn.commit()
+
     """
     Vložení dat z jednoho senzoru do historické tabulky a aktualizace aktuálního záznamu
     
@@ -82,8 +129,8 @@ class SqlSensorData:
 
         # Vložení do historické tabulky
         cursor.execute('''
-            INSERT INTO sensor_data (sensor_id, temperature, humidity)
-            VALUES (?, ?, ?)
+            INSERT INTO sensor_data (sensor_id, temperature, humidity, ts_epoch)
+            VALUES (?, ?, ?, CAST(strftime('%s', 'now') AS INTEGER))
         ''', (sensor_id, temperature, humidity))
 
         # Pokus o aktualizaci aktuálního záznamu
@@ -104,6 +151,35 @@ class SqlSensorData:
 
         self.conn.commit()
 
+    """
+    Vložení dat z více senzorů najednou (jedna transakce, jeden commit) do historické tabulky
+    a aktualizace aktuálních záznamů
+
+    Args:
+        rows: Seznam (sensor_id, temperature, humidity)
+    Returns:
+        None
+    """
+    def insert_many(self, rows: list[tuple[str, float, Optional[float]]]) -> None:
+        if not rows:
+            return
+        with self.conn:
+            # Vložení do historické tabulky
+            self.conn.executemany('''
+                INSERT INTO sensor_data (sensor_id, temperature, humidity, ts_epoch)
+                VALUES (?, ?, ?, CAST(strftime('%s', 'now') AS INTEGER))
+            ''', rows)
+
+            # Aktualizace aktuálního záznamu (nebo vložení nového)
+            self.conn.executemany('''
+                INSERT INTO current_sensor_data (sensor_id, temperature, humidity)
+                VALUES (?, ?, ?)
+                ON CONFLICT(sensor_id) DO UPDATE SET
+                    timestamp = CURRENT_TIMESTAMP,
+                    temperature = excluded.temperature,
+                    humidity = excluded.humidity
+            ''', rows)
+
     """
     Provedeni SELECT dotazu
 
@@ -113,10 +189,11 @@ class SqlSensorData:
         group_by: Podmínka GROUP BY (výchozí '')
         having: Podmínka HAVING (výchozí '')
         order_by: Podmínka ORDER BY (výchozí '')
+        params: Hodnoty parametrů '?' v podmínkách (výchozí ())
     Returns: 
         Objekt kurzoru s výsledky dotazu
     """
-    def __execute_select(self, columns: str = '*', where_clause: str = '', group_by: str = '', having: str = '', order_by: str = '') -> sqlite3.Cursor:
+    def __execute_select(self, columns: str = '*', where_clause: str = '', group_by: str = '', having: str = '', order_by: str = '', params: Sequence[Any] = ()) -> sqlite3.Cursor:
         query = f'SELECT {columns} FROM sensor_data'
         if where_clause:
             query += f' WHERE {where_clause}'
@@ -127,7 +204,7 @@ class SqlSensorData:
         if order_by:
             query += f' ORDER BY {order_by}'
         cursor = self.conn.cursor()
-        cursor.execute(query)
+        cursor.execute(query, params)
         return cursor
 
 
@@ -140,11 +217,12 @@ class SqlSensorData:
         group_by: Podmínka GROUP BY (výchozí '')
         having: Podmínka HAVING (výchozí '')
         order_by: Podmínka ORDER BY (výchozí '')
+        params: Hodnoty parametrů '?' v podmínkách (výchozí ())
     Returns: 
         Jeden řádek výsledku
     """
-    def execute_select_get_one(self, columns: str = '*', where_clause: str = '', group_by: str = '', having: str = '', order_by: str = '') -> Optional[tuple[Any, ...]]:
-        cursor = self.__execute_select(columns, where_clause, group_by, having, order_by)
+    def execute_select_get_one(self, columns: str = '*', where_clause: str = '', group_by: str = '', having: str = '', order_by: str = '', params: Sequence[Any] = ()) -> Optional[tuple[Any, ...]]:
+        cursor = self.__execute_select(columns, where_clause, group_by, having, order_by, params)
         return cursor.fetchone()
 
     """
@@ -156,12 +234,13 @@ class SqlSensorData:
         group_by: Podmínka GROUP BY (výchozí '')
         having: Podmínka HAVING (výchozí '')
         order_by: Podmínka ORDER BY (výchozí '')
+        params: Hodnoty parametrů '?' v podmínkách (výchozí ())
         default: Výchozí hodnota, pokud není žádný výsledek (výchozí None)
     Returns: 
         První hodnota prvního řádku výsledku nebo default
     """
-    def execute_select_get_one_return_first_column(self, columns: str = '*', where_clause: str = '', group_by: str = '', having: str = '', order_by: str = '', default: Optional[Any] = None) -> Optional[Any]:
-        result = self.execute_select_get_one(columns, where_clause, group_by, having, order_by)
+    def execute_select_get_one_return_first_column(self, columns: str = '*', where_clause: str = '', group_by: str = '', having: str = '', order_by: str = '', default: Optional[Any] = None, params: Sequence[Any] = ()) -> Optional[Any]:
+        result = self.execute_select_get_one(columns, where_clause, group_by, having, order_by, params)
         return result[0] if result else default
 
 
@@ -173,17 +252,43 @@ class SqlSensorData:
         where_clause: Podmínka WHERE (výchozí '')
         group_by: Podmínka GROUP BY (výchozí '')
         having: Podmínka HAVING (výchozí '')
-        order_by: Podmínka ORDER BY (výchozí '')    
+        order_by: Podmínka ORDER BY (výchozí '')
+        params: Hodnoty parametrů '?' v podmínkách (výchozí ())
     Returns: 
         Všechny řádky výsledku
     """
-    def execute_select_get_all(self, columns: str = '*', where_clause: str = '', group_by: str = '', having: str = '', order_by: str = '') -> list[tuple[Any, ...]]:
-        cursor = self.__execute_select(columns, where_clause, group_by, having, order_by)
+    def execute_select_get_all(self, columns: str = '*', where_clause: str = '', group_by: str = '', having: str = '', order_by: str = '', params: Sequence[Any] = ()) -> list[tuple[Any, ...]]:
+        cursor = self.__execute_select(columns, where_clause, group_by, having, order_by, params)
         return cursor.fetchall()
 
 
+    """
+    Provedení SELECT dotazu a postupné vracení řádků výsledku (generátor)
+    Řádky se z DB načítají po dávkách, celý výsledek tedy nikdy není v paměti najednou.
+
+    Args:
+        columns: Sloupce pro výběr (výchozí '*')
+        where_clause: Podmínka WHERE (výchozí '')
+        group_by: Podmínka GROUP BY (výchozí '')
+        having: Podmínka HAVING (výchozí '')
+        order_by: Podmínka ORDER BY (výchozí '')
+        params: Hodnoty parametrů '?' v podmínkách (výchozí ())
+        batch_size: Počet řádků načtených z DB najednou (výchozí 1000)
+    Returns: 
+        Iterátor přes řádky výsledku
+    """
+    def execute_select_iter(self, columns: str = '*', where_clause: str = '', group_by: str = '', having: str = '', order_by: str = '', params: Sequence[Any] = (), batch_size: int = 1000) -> Iterator[tuple[Any, ...]]:
+        cursor = self.__execute_select(columns, where_clause, group_by, having, order_by, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+
+
     """
     Vrátí názvy sloupců výsledku SELECT dotazu
+    Dotaz se jen připraví (LIMIT 0 - bez čtení dat, i u agregací) a výsledek se pro dané columns pamatuje.
 
     Args:
         columns: Sloupce pro výběr (výchozí '*')
@@ -191,8 +296,12 @@ class SqlSensorData:
         Seznam názvů sloupců
     """
     def get_column_names(self, columns: str = '*') -> list[str]:
-        cursor = self.__execute_select(columns)
-        return [description[0] for description in cursor.description]
+        names = self.__column_names.get(columns)
+        if names is None:
+            cursor = self.conn.execute(f'SELECT {columns} FROM sensor_data LIMIT 0')
+            names = [description[0] for description in cursor.description]
+            self.__column_names[columns] = names
+        return names
 
 
     """
@@ -200,11 +309,12 @@ class SqlSensorData:
 
     Args:
         where_clause: Podmínka WHERE (výchozí '')
+        params: Hodnoty parametrů '?' v podmínce (výchozí ())
     Returns: 
         Průměrná teplota nebo None
     """
-    def get_average_temperature(self, where_clause: str = '') -> float | None:
-        return self.execute_select_get_one_return_first_column("AVG(temperature)", where_clause=where_clause)
+    def get_average_temperature(self, where_clause: str = '', params: Sequence[Any] = ()) -> float | None:
+        return self.execute_select_get_one_return_first_column("AVG(temperature)", where_clause=where_clause, params=params)
 
 
     """
@@ -212,11 +322,12 @@ class SqlSensorData:
 
     Args:
         where_clause: Podmínka WHERE (výchozí '')
+        params: Hodnoty parametrů '?' v podmínce (výchozí ())
     Returns: 
         Minimální teplota nebo None
     """
-    def get_min_temperature(self, where_clause: str = '') -> float | None:
-        return self.execute_select_get_one_return_first_column("MIN(temperature)", where_clause=where_clause)
+    def get_min_temperature(self, where_clause: str = '', params: Sequence[Any] = ()) -> float | None:
+        return self.execute_select_get_one_return_first_column("MIN(temperature)", where_clause=where_clause, params=params)
 
 
     """
@@ -224,11 +335,12 @@ class SqlSensorData:
 
     Args:
         where_clause: Podmínka WHERE (výchozí '')
+        params: Hodnoty parametrů '?' v podmínce (výchozí ())
     Returns: 
         Maximální teplota nebo None
     """
-    def get_max_temperature(self, where_clause: str = '') -> float | None:
-        return self.execute_select_get_one_return_first_column("MAX(temperature)", where_clause=where_clause)
+    def get_max_temperature(self, where_clause: str = '', params: Sequence[Any] = ()) -> float | None:
+        return self.execute_select_get_one_return_first_column("MAX(temperature)", where_clause=where_clause, params=params)
 
 
     """
@@ -236,9 +348,23 @@ class SqlSensorData:
     
     Args:
         where_clause: Podmínka WHERE (výchozí '')
+        params: Hodnoty parametrů '?' v podmínce (výchozí ())
     Returns:
         Počet záznamů nebo None
     """
-    def count(self, where_clause: str = '') -> int | None:
-        return self.execute_select_get_one_return_first_column("COUNT(*)", where_clause=where_clause)
+    def count(self, where_clause: str = '', params: Sequence[Any] = ()) -> int | None:
+        return self.execute_select_get_one_return_first_column("COUNT(*)", where_clause=where_clause, params=params)
+
+
+    """
+    Vrátí počet záznamů, průměrnou, minimální a maximální teplotu jedním dotazem
+
+    Args:
+        where_clause: Podmínka WHERE (výchozí '')
+        params: Hodnoty parametrů '?' v podmínce (výchozí ())
+    Returns:
+        Tuple (počet, průměr, minimum, maximum); bez záznamů (0, None, None, None)
+    """
+    def get_stats(self, where_clause: str = '', params: Sequence[Any] = ()) -> tuple[int, float | None, float | None, float | None]:
+        return self.execute_select_get_one("COUNT(*), AVG(temperature), MIN(temperature), MAX(temperature)", where_clause=where_clause, params=params)
 
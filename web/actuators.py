@@ -2,8 +2,10 @@
 import os
 import signal
 import atexit
+import time
+import queue
 import threading
-from typing import Dict, Optional, Any
+from typing import Dict, Optional, Any, List
 import logging
 
 try:
@@ -12,54 +14,64 @@ except Exception:
     LED = None
     OutputDevice = None
 
-from db import SqlSensorData
+from db import SqlSensorData, DEFAULT_DB_PATH, decode_nv_value
 
 logger = logging.getLogger("actuators")
 
 NV_PREFIX = "actuator-"  # prefix pro klíče v nonvolatile_params
 ALLOWED_RELAY_MODES = ("auto", "on", "off")
+PERSIST_DELAY = 0.5  # s - zápisy parametrů do DB se slučují a ukládají najednou po této prodlevě
+
+
+class Actuator:
+    """
+    Jeden aktuátor: konfigurace (typ, pin), gpiozero zařízení, stav v cache a parametry.
+    Vše pohromadě -> jedna dict lookup podle jména místo čtyř paralelních slovníků.
+    """
+    __slots__ = ("typ", "pin", "device", "state", "params")
+
+    def __init__(self, typ: Optional[str], pin: Optional[int], params: Optional[Dict[str, Any]] = None) -> None:
+        self.typ: Optional[str] = typ
+        self.pin: Optional[int] = pin
+        self.device: Optional[object] = None
+        self.state: bool = False
+        self.params: Dict[str, Any] = params if params is not None else {}
+
 
 class ActuatorManager:
-    def __init__(self, config: Optional[Dict[str, Dict]] = None):
+    def __init__(self, config: Optional[Dict[str, Dict]] = None, db_path: str = DEFAULT_DB_PATH):
         self._default_config = {
             "led_DHT11_01": {"type": "led", "pin": 18},
             "led_DHT11_02": {"type": "led", "pin": 12},
             "relay_DHT11_01": {"type": "relay", "pin": 23},
             "relay_DHT11_02": {"type": "relay", "pin": 24},
         }
-        self._config = (config.copy() if config else self._default_config.copy())
-        self._devices: Dict[str, Optional[object]] = {k: None for k in self._config}
-        self._states: Dict[str, bool] = {k: False for k in self._config}
-        self._params: Dict[str, Dict[str, Any]] = {k: {} for k in self._config}
-
-        # defaulty parametrů
-        for name in list(self._params.keys()):
-            if "relay" in name:
-                self._params[name].setdefault("relay_mode", "auto")
-                self._params[name].setdefault("setpoint", 25.0)
-            if "led" in name:
-                self._params[name].setdefault("label", name)
-                self._params[name].setdefault("invert", False)
+        self._actuators: Dict[str, Actuator] = {}
+        self._relay_names: List[str] = []
+        self._apply_config(config.copy() if config else self._default_config.copy())
 
         self._inited = False
+        self._closed = False  # close_all uz probehl (signal handler i atexit -> uklizime jen jednou)
         self._lock = threading.RLock()
-        self._db: Optional[SqlSensorData] = None
+        # sqlite3 spojení nesdílíme mezi vlákny (Flask requesty, termostat) -> pamatujeme si jen cestu;
+        # čtení si otevírá vlastní spojení (viz _open_db), zápisy dělá jediné vlákno _db_worker
+        self._db_path: Optional[str] = None
+        # fronta úloh pro zapisovací vlákno: ("save", name, param, value) | ("flush", Event) | None (konec)
+        self._db_q: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._db_thread: Optional[threading.Thread] = None
         try:
-            db = SqlSensorData()
-            db.open()
-            self._db = db
-            try:
-                loaded = self._db.load_actuator_params(prefix=NV_PREFIX)
-                for name, kv in loaded.items():
-                    if name not in self._params:
-                        self._params[name] = {}
-                    self._params[name].update(kv)
-            except Exception:
-                # pokud nemáme parametry pokračujeme bez nich ale s vytvorenou DB
-                pass
+            # jen ověříme dostupnost DB; parametry se načtou jednou v init_if_needed
+            with SqlSensorData(db_path) as db:
+                # WAL je perzistentní v souboru DB - čtenáři pak neblokují zápisy a naopak
+                db.conn.execute("PRAGMA journal_mode=WAL")
+                self._db_path = db_path
         except Exception:
-            # pokud se nepovedlo inicializovat SqlSensorData pokračujeme, ale bez DB
-            self._db = None
+            # pokud se nepovedlo otevřít SqlSensorData pokračujeme, ale bez DB
+            self._db_path = None
+
+        if self._db_path:
+            self._db_thread = threading.Thread(target=self._db_worker, name="actuators-db", daemon=True)
+            self._db_thread.start()
 
         try:
             atexit.register(self.close_all)
@@ -80,11 +92,31 @@ class ActuatorManager:
                 raise RuntimeError("Cannot reconfigure after init")
             new = self._default_config.copy()
             new.update(mapping)
-            self._config = new
-            self._devices = {k: None for k in self._config}
-            self._states = {k: False for k in self._config}
-            new_params = {k: self._params.get(k, {}) for k in self._config}
-            self._params = new_params
+            self._apply_config(new)
+
+    # vytvori aktuatory podle konfigurace (parametry existujicich jmen zachova),
+    # doplni defaulty parametru podle typu aktuatoru (cfg["type"]) a obnovi seznam rele
+    def _apply_config(self, config: Dict[str, Dict]):
+        actuators: Dict[str, Actuator] = {}
+        for name, cfg in config.items():
+            old = self._actuators.get(name)
+            act = Actuator(cfg.get("type"), cfg.get("pin"), old.params if old is not None else None)
+            if act.typ == "relay":
+                act.params.setdefault("relay_mode", "auto")
+                act.params.setdefault("setpoint", 25.0)
+            elif act.typ == "led":
+                act.params.setdefault("label", name)
+                act.params.setdefault("invert", False)
+            actuators[name] = act
+        self._actuators = actuators
+        self._relay_names = [n for n, a in actuators.items() if a.typ == "relay"]
+
+    # vrati aktuator podle jmena, KeyError pokud neexistuje
+    def _get(self, name: str) -> Actuator:
+        act = self._actuators.get(name)
+        if act is None:
+            raise KeyError(name)
+        return act
 
     # ---- inicializace ----
     def init_if_needed(self):
@@ -93,9 +125,9 @@ class ActuatorManager:
             if self._inited:
                 logger.info("uz inicializovano")
                 return
-            for name, cfg in self._config.items():
-                typ = cfg.get("type")
-                pin = cfg.get("pin")
+            for name, act in self._actuators.items():
+                typ = act.typ
+                pin = act.pin
 #                print(typ, pin)
                 dev = None
                 if typ == "led" and LED is not None:
@@ -109,23 +141,26 @@ class ActuatorManager:
                     except Exception as e:
                         dev = None
                 logger.info(f"Device: name={name} type={typ}, pin={pin}, created={dev}")
-                self._devices[name] = dev
-                self._states[name] = False
+                act.device = dev
+                act.state = False
             self._inited = True
-            if self._db:
+            self._closed = False
+            if self._db_path:
                 try:
-                    loaded = self._db.load_actuator_params(prefix=NV_PREFIX)
-                    for name, kv in loaded.items():
-                        if name not in self._params:
-                            self._params[name] = {}
-                        self._params[name].update(kv)
-                    for device in self._devices:
-                        if device is not None:
-                            self.s
+                    with self._open_db() as db:
+                        loaded = db.load_actuator_params(prefix=NV_PREFIX)
+                    self._merge_loaded_params(loaded)
                 except Exception:
+                    # pokud nemáme parametry pokračujeme bez nich (zůstanou defaulty)
                     pass
             self._restore_state_in_all_devices()
 
+    def _open_db(self) -> SqlSensorData:
+        """
+        Vrátí nové (neotevřené) spojení pro jednu operaci; použij `with self._open_db() as db:`.
+        """
+        return SqlSensorData(self._db_path)
+
     def _ensure_inited(self):
         if not self._inited:
             self.init_if_needed()
@@ -138,126 +173,173 @@ class ActuatorManager:
 
     # ---- základní param metody ----
     def get_relays(self):
-        list = []
-        for name, cfg in self._config.items():
-            typ = cfg.get("type")
-            if typ == "relay":
-                list.append(name)
-        return list
+        return list(self._relay_names)
     
     # ulozi parametr k aktuatoru
     def set_param(self, name: str, param: str, value: Any, persist: bool = True):
         with self._lock:
-            logger.info(f"set_param(name={name}, param={param}, value={value}, persist={persist})")
-            if name not in self._params:
-                raise KeyError(name)
-            self._params[name][param] = value
+            logger.debug("set_param(name=%s, param=%s, value=%s, persist=%s)", name, param, value, persist)
+            self._get(name).params[param] = value
             if persist:
                 self.save_param(name, param)
 
     # precte parametr k aktuatoru
     def get_param(self, name: str, param: str, default: Any = None) -> Any:
-        logger.info(f"get_param(name={name}, param={param}, default={default})")
+        logger.debug("get_param(name=%s, param=%s, default=%s)", name, param, default)
         with self._lock:
-            if name not in self._params:
-                raise KeyError(name)
-            if param in self._params[name]:
+            params = self._get(name).params
+            if param in params:
                 # pokud máme parametr v paměti, rovnou ho vrátíme
-                value = self._params[name][param]
-                logger.info(f"get_param from memory - {value}")
+                value = params[param]
+                logger.debug("get_param from memory - %s", value)
                 return value
-            if self._db:
-                # pokusime se ho vycist z DB pokud ji mame
-                v = self.load_param(name, param)
-                logger.info(f"get_param from db - {v}")
-                return default if v is None else v
-            return default
-
-    # ulozi hodnotu parametru persistentne (do DB)
+        if self._db_path:
+            # pokusime se ho vycist z DB pokud ji mame (mimo zamek - DB I/O neblokuje ostatní vlákna)
+            v = self.load_param(name, param)
+            logger.debug("get_param from db - %s", v)
+            return default if v is None else v
+        return default
+
+    # ulozi hodnotu parametru persistentne (do DB) - zapis je odlozeny, viz _schedule_persist
     def save_param(self, name: str, param: str):
+        if not self._db_path:
+            return
         with self._lock:
-            if not self._db:
-                return
-            if name not in self._params:
-                raise KeyError(name)
-            if param not in self._params[name]:
+            params = self._get(name).params
+            if param not in params:
                 # takovy parametr nemame -> nelze ho tedy ulozit do DB
                 return
+            self._schedule_persist(name, param, params[param])
+
+    # zaradi parametr k ulozeni; vice zmen behem PERSIST_DELAY se ulozi jednou transakci
+    def _schedule_persist(self, name: str, param: str, value: Any):
+        if not self._db_path:
+            return
+        if self._db_thread is not None and self._db_thread.is_alive():
+            self._db_q.put(("save", name, param, value))
+            return
+        # zapisovaci vlakno uz nebezi (po close_all) -> ulozime primo
+        try:
+            with self._open_db() as db:
+                db.save_actuator_param(name, param, value, prefix=NV_PREFIX)
+        except Exception:
+            logger.exception("save_params failed for %s.%s", name, param)
+
+    # pocka, nez zapisovaci vlakno ulozi vsechny cekajici zmeny parametru do DB
+    def flush_params(self, timeout: float = 5.0):
+        if self._db_thread is None or not self._db_thread.is_alive():
+            return
+        done = threading.Event()
+        self._db_q.put(("flush", done))
+        done.wait(timeout)
+
+    # zapisovaci vlakno: jedine vlakno, ktere do DB zapisuje; vlastni sve spojeni
+    def _db_worker(self):
+        db: Optional[SqlSensorData] = None
+        pending: Dict[str, Dict[str, Any]] = {}
+        waiters: List[threading.Event] = []
+        deadline = 0.0
+        running = True
+        while running:
+            timeout = max(0.0, deadline - time.monotonic()) if pending else None
             try:
-                value = self._params[name][param]
-                self._db.save_actuator_param(name, param, value, prefix=NV_PREFIX)
-            except Exception as ex:
-                print("save_params - exception", ex)
-                pass
+                job = self._db_q.get(timeout=timeout)
+            except queue.Empty:
+                job = ("flush", None)
+            if job is None:
+                running = False
+            elif job[0] == "save":
+                _, name, param, value = job
+                if not pending:
+                    deadline = time.monotonic() + PERSIST_DELAY
+                pending.setdefault(name, {})[param] = value
+                continue
+            elif job[1] is not None:
+                waiters.append(job[1])
+
+            if pending:
+                try:
+                    if db is None:
+                        db = self._open_db()
+                        db.open()
+                    db.save_actuator_params_bulk(pending, prefix=NV_PREFIX)
+                except Exception:
+                    logger.exception("flush_params failed for %d actuator(s)", len(pending))
+                    if db is not None:
+                        db.close()
+                        db = None
+                pending = {}
+            for ev in waiters:
+                ev.set()
+            waiters = []
+        if db is not None:
+            db.close()
+
+    def _stop_db_worker(self):
+        if self._db_thread is None:
+            return
+        self._db_q.put(None)
+        self._db_thread.join(timeout=5.0)
+        self._db_thread = None
 
     # vycte parametr z DB
     def load_param(self, name: str, param: str) -> Optional[Any]:
+        if not self._db_path:
+            return None
         with self._lock:
-            if not self._db:
-                return None
-            if name not in self._params:
-                raise KeyError(name)
-            try:
-                key = f"{NV_PREFIX}{name}-{param}"
-                v = self._db.nv_get(key)
-                if v is None:
-                    return None
-                if v in ("True", "False"):
-                    parsed = True if v == "True" else False
-                else:
-                    try:
-                        if "." in v:
-                            parsed = float(v)
-                        else:
-                            parsed = int(v)
-                    except Exception:
-                        parsed = v
-                self._params[name][param] = parsed
-                return parsed
-            except Exception:
+            act = self._get(name)
+        try:
+            key = f"{NV_PREFIX}{name}-{param}"
+            with self._open_db() as db:
+                v = db.nv_get(key)
+            if v is None:
                 return None
+            parsed = decode_nv_value(v)
+            with self._lock:
+                act.params[param] = parsed
+            return parsed
+        except Exception:
+            return None
 
     def save_all_params(self):
+        if not self._db_path:
+            return
         with self._lock:
-            if not self._db:
-                return
-            try:
-                self._db.save_actuator_params_bulk(self._params, prefix=NV_PREFIX)
-            except Exception:
-                pass
+            snapshot = [(name, param, value) for name, act in self._actuators.items() for param, value in act.params.items()]
+        for name, param, value in snapshot:
+            self._schedule_persist(name, param, value)
+        self.flush_params()
 
     def load_all_params(self):
+        if not self._db_path:
+            return
+        try:
+            with self._open_db() as db:
+                loaded = db.load_actuator_params(prefix=NV_PREFIX)
+        except Exception:
+            return
         with self._lock:
-            if not self._db:
-                return
-            try:
-                loaded = self._db.load_actuator_params(prefix=NV_PREFIX)
-                for name, kv in loaded.items():
-                    if name not in self._params:
-                        self._params[name] = {}
-                    self._params[name].update(kv)
-            except Exception:
-                pass
+            self._merge_loaded_params(loaded)
+
+    # doplni parametry nactene z DB; parametry neznamych jmen (stara konfigurace) ignoruje
+    def _merge_loaded_params(self, loaded: Dict[str, Dict[str, Any]]):
+        for name, kv in loaded.items():
+            act = self._actuators.get(name)
+            if act is not None:
+                act.params.update(kv)
 
     # ---- wrappery pro relay ----
     def set_relay_mode(self, name: str, mode: str, persist: bool = True):
         if mode not in ALLOWED_RELAY_MODES:
             raise ValueError(f"Invalid relay mode '{mode}'. Allowed: {ALLOWED_RELAY_MODES}")
         with self._lock:
-            if name not in self._params:
-                raise KeyError(name)
-            self._params[name]["relay_mode"] = mode
-            if persist and self._db:
-                try:
-                    self._db.save_actuator_param(name, "relay_mode", mode, prefix=NV_PREFIX)
-                except Exception:
-                    pass
+            self._get(name).params["relay_mode"] = mode
+        if persist:
+            self._schedule_persist(name, "relay_mode", mode)
 
     def get_relay_mode(self, name: str) -> str:
         with self._lock:
-            if name not in self._params:
-                raise KeyError(name)
-            return str(self._params[name].get("relay_mode", "auto"))
+            return str(self._get(name).params.get("relay_mode", "auto"))
 
     def set_setpoint(self, name: str, setpoint: float, persist: bool = True, min_v: float = -50.0, max_v: float = 150.0):
         if not isinstance(setpoint, (int, float)):
@@ -265,20 +347,13 @@ class ActuatorManager:
         if not (min_v <= setpoint <= max_v):
             raise ValueError(f"Setpoint {setpoint} out of allowed range [{min_v}, {max_v}]")
         with self._lock:
-            if name not in self._params:
-                raise KeyError(name)
-            self._params[name]["setpoint"] = float(setpoint)
-            if persist and self._db:
-                try:
-                    self._db.save_actuator_param(name, "setpoint", float(setpoint), prefix=NV_PREFIX)
-                except Exception:
-                    pass
+            self._get(name).params["setpoint"] = float(setpoint)
+        if persist:
+            self._schedule_persist(name, "setpoint", float(setpoint))
 
     def get_setpoint(self, name: str) -> float:
         with self._lock:
-            if name not in self._params:
-                raise KeyError(name)
-            val = self._params[name].get("setpoint", 25.0)
+            val = self._get(name).params.get("setpoint", 25.0)
             try:
                 return float(val)
             except Exception:
@@ -287,39 +362,25 @@ class ActuatorManager:
     # ---- wrappery pro LED vlastnosti ----
     def set_led_label(self, name: str, label: str, persist: bool = True):
         with self._lock:
-            if name not in self._params:
-                raise KeyError(name)
-            self._params[name]["label"] = str(label)
-            if persist and self._db:
-                try:
-                    self._db.save_actuator_param(name, "label", str(label), prefix=NV_PREFIX)
-                except Exception:
-                    pass
+            self._get(name).params["label"] = str(label)
+        if persist:
+            self._schedule_persist(name, "label", str(label))
 
     def get_led_label(self, name: str) -> str:
         with self._lock:
-            if name not in self._params:
-                raise KeyError(name)
-            return str(self._params[name].get("label", name))
+            return str(self._get(name).params.get("label", name))
 
     def set_led_invert(self, name: str, invert: bool, persist: bool = True):
         if not isinstance(invert, bool):
             raise ValueError("invert must be boolean")
         with self._lock:
-            if name not in self._params:
-                raise KeyError(name)
-            self._params[name]["invert"] = invert
-            if persist and self._db:
-                try:
-                    self._db.save_actuator_param(name, "invert", str(invert), prefix=NV_PREFIX)
-                except Exception:
-                    pass
+            self._get(name).params["invert"] = invert
+        if persist:
+            self._schedule_persist(name, "invert", invert)
 
     def get_led_invert(self, name: str) -> bool:
         with self._lock:
-            if name not in self._params:
-                raise KeyError(name)
-            return bool(self._params[name].get("invert", False))
+            return bool(self._get(name).params.get("invert", False))
 
     # ---- mozne prime pouziti ----
     def turn_on(self, name: str) -> bool:
@@ -336,76 +397,77 @@ class ActuatorManager:
     # ---- základní operace pro HW ----
     def set_actor(self, name: str, on: bool) -> bool:
         with self._lock:
-            if name not in self._devices:
-                raise KeyError(name)
+            act = self._get(name)
             self._ensure_inited()
-            dev = self._devices.get(name)
+            dev = act.device
             try:
                 if dev is None:
-                    self._states[name] = bool(on)
+                    act.state = bool(on)
                     self.set_param(name, "state", bool(on), persist=True)
                     return False
                 if on:
                     dev.on()
                 else:
                     dev.off()
-                self._states[name] = bool(on)
+                act.state = bool(on)
                 self.set_param(name, "state", bool(on), persist=True)
                 return True
             except Exception:
-                self._states[name] = bool(on)
+                act.state = bool(on)
                 try:
                     self.set_param(name, "state", bool(on), persist=True)
                 except Exception:
                     pass
                 return False
 
+    # obnovi ulozene stavy do HW; volano z init_if_needed pod zamkem, stav uz je v DB -> neukladame
     def _restore_state_in_all_devices(self):
-        for name, dev in list(self._devices.items()):
-            if dev is not None:
+        for name, act in self._actuators.items():
+            state = bool(act.params.setdefault("state", False))
+            if act.device is not None:
                 try:
-                    self.set_actor(name, self._params[name]["state"])
-                except Exception as ex:
-                    print("restore_state - exception", ex)
-
+                    self._apply_state_fast(act, state)
+                except Exception:
+                    logger.exception("restore_state failed for %s", name)
+            else:
+                act.state = state
+
+    # prime nastaveni HW bez zamku a bez zapisu do DB (volajici drzi self._lock)
+    def _apply_state_fast(self, act: Actuator, on: bool):
+        if on:
+            act.device.on()
+        else:
+            act.device.off()
+        act.state = on
+
+    # stav aktuatoru z cache: Actuator.state je zdroj pravdy (nastavuji ho set_actor a obnova po init),
+    # vystupni zarizeni gpiozero sve stavy samo nemeni -> HW neodecitame a zamek bezne nebereme
     def get_actor_state(self, name: str) -> bool:
-        with self._lock:
-            if name not in self._states:
-                raise KeyError(name)
-            self._ensure_inited()
-            dev = self._devices.get(name)
-            if dev is None:
-                return self._states[name]
-            try:
-                st = dev.is_active
-                self._states[name] = st
-                self._params[name]["state"] = st
-                return st
-            except Exception as ex:
-                logger.exception("Exception in read state from device: %s", ex)
-                return self._states[name]
+        act = self._get(name)
+        if not self._inited:
+            with self._lock:
+                self._ensure_inited()
+        return act.state
 
     # ---- cleanup ----
     def close_all(self):
         with self._lock:
-            for name, dev in list(self._devices.items()):
-                if dev is not None:
+            if self._closed:
+                return
+            self._closed = True
+            for act in self._actuators.values():
+                if act.device is not None:
                     try:
-                        dev.close()
+                        act.device.close()
                     except Exception:
                         pass
-                    self._devices[name] = None
+                    act.device = None
             self._inited = False
             try:
                 self.save_all_params()
             except Exception:
                 pass
-            try:
-                if self._db is not None:
-                    self._db.close()
-                    self._db = None
-            except Exception:
-                pass
+            self._stop_db_worker()
 
     def __enter__(self):
         self.init_if_needed()
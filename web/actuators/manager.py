@@ -2,13 +2,17 @@ import threading
 import atexit
 import signal
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple, Union
 from db import SqlSensorData
 from .devices import LedDevice, RelayDevice
 from .params import ParamRepository
 
 logger = logging.getLogger("actuators")
 
+# druh aktuátoru - určuje se jednou podle jména při vytvoření manageru
+_KIND_LED = 0
+_KIND_RELAY = 1
+
 
 class SensorConfig:
     def __init__(self, name: str, led_pin: Optional[int] = None, relay_pin: Optional[int] = None) -> None:
@@ -26,6 +30,14 @@ class ActuatorManager:
         for name, cfg in sensors.items():
             self._sensors[name] = SensorConfig(name, cfg.get("led_pin"), cfg.get("relay_pin"))
 
+        # jméno aktuátoru ("led_<sensor>" / "relay_<sensor>") -> (druh, sensor, zařízení)
+        self._actors: Dict[str, Tuple[int, str, Union[LedDevice, RelayDevice]]] = {}
+        for name, sensor_cfg in self._sensors.items():
+            self._actors[f"led_{name}"] = (_KIND_LED, name, sensor_cfg.led)
+            self._actors[f"relay_{name}"] = (_KIND_RELAY, name, sensor_cfg.relay)
+        # platná jména aktuátorů - pro rychlou validaci vstupu v API
+        self.valid_actors: frozenset[str] = frozenset(self._actors)
+
         # obnov stavy z DB
         self.load_params_from_db()
 
@@ -56,69 +68,56 @@ class ActuatorManager:
         return float(self._sensors[sensor].relay.setpoint)
 
     def set_setpoint(self, sensor: str, setpoint: float) -> None:
-        self._sensors[sensor].relay.setpoint = float(setpoint)
-        self._params.set_param(sensor, "setpoint", float(setpoint))
+        with self._lock:
+            self._sensors[sensor].relay.setpoint = float(setpoint)
+            self._params.set_param(sensor, "setpoint", float(setpoint))
 
     def get_relay_mode(self, sensor: str) -> str:
         return self._sensors[sensor].relay.mode
 
     def set_relay_mode(self, sensor: str, mode: str) -> None:
-        self._sensors[sensor].relay.mode = mode
-        self._params.set_param(sensor, "relay_mode", mode)
+        with self._lock:
+            self._sensors[sensor].relay.mode = mode
+            self._params.set_param(sensor, "relay_mode", mode)
 
     def get_relay_state(self, sensor: str) -> bool:
         return self._sensors[sensor].relay.get_state()
 
     def turn_on_relay(self, sensor: str) -> None:
-        self._sensors[sensor].relay.set_state(True)
-        self._params.set_param(sensor, "relay_state", True)
+        with self._lock:
+            self._sensors[sensor].relay.set_state(True)
+            self._params.set_param(sensor, "relay_state", True)
 
     def turn_off_relay(self, sensor: str) -> None:
-        self._sensors[sensor].relay.set_state(False)
-        self._params.set_param(sensor, "relay_state", False)
+        with self._lock:
+            self._sensors[sensor].relay.set_state(False)
+            self._params.set_param(sensor, "relay_state", False)
+
+    def _actor(self, actor_name: str) -> Tuple[int, str, Union[LedDevice, RelayDevice]]:
+        actor = self._actors.get(actor_name)
+        if actor is None:
+            raise KeyError(f"Unknown actor {actor_name}")
+        return actor
 
     def get_actor_state(self, actor_name: str) -> bool:
-        if actor_name.startswith("led_"):
-            sensor = actor_name.removeprefix("led_")
-            return self._sensors[sensor].led.get_state()
-        elif actor_name.startswith("relay_"):
-            sensor = actor_name.removeprefix("relay_")
-            return self._sensors[sensor].relay.get_state()
-        else:
-            raise KeyError(f"Unknown actor name: {actor_name}")
+        return self._actor(actor_name)[2].get_state()
 
     def set_actor(self, actor_name: str, on: bool) -> None:
-        if actor_name.startswith("led_"):
-            sensor = actor_name.removeprefix("led_")
-            print(sensor)
-            self._sensors[sensor].led.set_state(on)
-            self._params.set_param(sensor, "led_state", on)
-        elif actor_name.startswith("relay_"):
-            sensor = actor_name.removeprefix("relay_")
-            self._sensors[sensor].relay.set_state(on)
-            self._params.set_param(sensor, "relay_state", on)
-        else:
-            raise KeyError(f"Unknown actor name: {actor_name}")
+        kind, sensor, device = self._actor(actor_name)
+        with self._lock:
+            if kind == _KIND_LED:
+                logger.debug("set_actor: led %s -> %s", sensor, on)
+                device.set_state(on)
+                self._params.set_param(sensor, "led_state", on)
+            else:
+                device.set_state(on)
+                self._params.set_param(sensor, "relay_state", on)
 
     def get_actor_hw_present(self, actor_name: str) -> bool:
-        if actor_name.startswith("led_"):
-            sensor = actor_name.removeprefix("led_")
-            return self._sensors[sensor].led.pin is not None
-        elif actor_name.startswith("relay_"):
-            sensor = actor_name.removeprefix("relay_")
-            return self._sensors[sensor].relay.pin is not None
-        else:
-            raise KeyError(f"Unknown actor {actor_name}")
+        return self._actor(actor_name)[2].pin is not None
 
     def get_actor_hw_state(self, actor_name: str) -> Optional[bool]:
-        if actor_name.startswith("led_"):
-            sensor = actor_name.removeprefix("led_")
-            return self._sensors[sensor].led.get_hw_state()
-        elif actor_name.startswith("relay_"):
-            sensor = actor_name.removeprefix("relay_")
-            return self._sensors[sensor].relay.get_hw_state()
-        else:
-            raise KeyError(f"Unknown actor {actor_name}")
+        return self._actor(actor_name)[2].get_hw_state()
 
     def get_actor_states(self, actor_name: str) -> dict[str, Optional[bool]]:
         """
@@ -130,20 +129,28 @@ class ActuatorManager:
         Returns:
             dict[str, Optional[bool]]: {"logical": True/False, "hw": True/False/None}
         """
-        if actor_name.startswith("led_"):
-            sensor = actor_name.removeprefix("led_")
-            return {
-                "logical": self._sensors[sensor].led.get_state(),
-                "hw": self._sensors[sensor].led.get_hw_state(),
-            }
-        elif actor_name.startswith("relay_"):
-            sensor = actor_name.removeprefix("relay_")
-            return {
-                "logical": self._sensors[sensor].relay.get_state(),
-                "hw": self._sensors[sensor].relay.get_hw_state(),
-            }
-        else:
-            raise KeyError(f"Unknown actor {actor_name}")
+        device = self._actor(actor_name)[2]
+        return {
+            "logical": device.get_state(),
+            "hw": device.get_hw_state(),
+        }
+
+    def get_actor_full_state(self, actor_name: str) -> dict[str, Any]:
+        """
+        Vrátí logický i HW stav aktuátoru a u relé i jeho režim - vše jedním voláním pod jedním zámkem.
+
+        Args:
+            actor_name (str): Jméno aktuátoru (např. 'led_DHT11_01' nebo 'relay_DHT11_02').
+
+        Returns:
+            dict[str, Any]: {"logical": True/False, "hw": True/False/None} (+ "mode" u relé)
+        """
+        kind, _, device = self._actor(actor_name)
+        with self._lock:
+            result = {"logical": device.get_state(), "hw": device.get_hw_state()}
+            if kind == _KIND_RELAY:
+                result["mode"] = device.mode
+            return result
 
     # --- init/cleanup ---
     def load_params_from_db(self) -> None:
@@ -161,9 +168,10 @@ class ActuatorManager:
             sensor_cfg.relay.setpoint = float(setpoint)
 
     def close_all(self) -> None:
-        for sensor_cfg in self._sensors.values():
-            sensor_cfg.led.close()
-            sensor_cfg.relay.close()
+        with self._lock:
+            for sensor_cfg in self._sensors.values():
+                sensor_cfg.led.close()
+                sensor_cfg.relay.close()
 
     def _handle_sig(self, signum, frame):
         self.close_all()
@@ -10,7 +10,7 @@
 
 from typing import Dict, Any, Optional
 import logging
-from db import SqlSensorData
+from db import SqlSensorData, decode_nv_value
 
 NV_PREFIX: str = "actuator-"
 
@@ -93,7 +93,7 @@ class ParamRepository:
         try:
             with SqlSensorData() as db:
                 v = db.nv_get(f"{NV_PREFIX}{name}-{param}")
-            return v if v is not None else default
+            return decode_nv_value(v) if v is not None else default
         except Exception as ex:
             logger = logging.getLogger("actuators")
             logger.exception("Failed to read param %s/%s: %s", name, param, ex)
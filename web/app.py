@@ -11,21 +11,36 @@ configure_logging(log_file=LOG_FILE, level=logging.DEBUG, console=True)
 logger = logging.getLogger("web")
 
 import os
+import time
+import threading
+from functools import lru_cache
 from typing import Optional
 from db import SqlSensorData
 from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
 from thermostat import Thermostat
 from actuators.manager import ActuatorManager
 from services.time_utils import resolve_tz
+from services.json_provider import install_json_provider
 from services.aggregate_service import api_aggregate, compute_dew_point
 from services.api_utils import make_api_response, make_api_response_error, getQueryDataSensors, getQueryDataLatest, getQueryDataAggregate, getQueryLogsTail, getQueryLed, getQueryRelay, getQueryRelaySetpoint
 from services.api_actuators import api_get_logs, api_read_led, api_write_led, api_read_relay, api_write_relay, api_read_setpoint, api_write_setpoint
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user
 from werkzeug.security import generate_password_hash, check_password_hash
 
+try:
+    from waitress import serve
+except Exception:
+    serve = None
+
+# adresa a počet vláken HTTP serveru (CloudFlared tunel míří na localhost:5000)
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 5000
+SERVER_THREADS = 8
+
 
 act: Optional[ActuatorManager] = None
 app = Flask(__name__)
+install_json_provider(app)      # orjson pro rychlejší serializaci odpovědí (pokud je nainstalovaný)
 
 
 # Secret key pro session (čti z env v produkci)
@@ -93,6 +108,59 @@ sensor_map = {
     "DHT11_02": "Venkovní senzor",
     "DHT11_03": "další který nemám",
 }
+# předpřipravené (sdílené, nemodifikovat) položky odpovědi /api/sensors pro známé senzory
+_sensor_entries = {sensor_id: {"id": sensor_id, "name": name} for sensor_id, name in sensor_map.items()}
+
+# seznam senzorů se mění zřídka -> odpověď /api/sensors držíme v cache po SENSORS_CACHE_TTL sekund
+SENSORS_CACHE_TTL = 30.0
+_sensors_cache = {"t": 0.0, "payload": None}
+_sensors_lock = threading.Lock()
+
+
+def get_sensors_list():
+    """
+    Vraci seznam senzoru [{id, name}] pro /api/sensors (z cache, po vyprseni TTL znovu z DB).
+
+    Returns:
+        list: seznam dictu s id a jmenem senzoru
+    """
+    with _sensors_lock:
+        now = time.monotonic()
+        if _sensors_cache["payload"] is None or now - _sensors_cache["t"] >= SENSORS_CACHE_TTL:
+            with SqlSensorData() as db:
+                ids = db.get_sensor_ids()
+            _sensors_cache["payload"] = [_sensor_entries.get(sensor_id) or {"id": sensor_id, "name": sensor_id} for sensor_id in ids]
+            _sensors_cache["t"] = now
+        return _sensors_cache["payload"]
+
+@lru_cache(maxsize=8)
+def _static_img_files(static_path):
+    """
+    Lists file names in static/img once (one directory read instead of a stat per candidate).
+
+    Returns:
+        frozenset: file names present in static/img
+    """
+    try:
+        with os.scandir(os.path.join(static_path, 'img')) as entries:
+            return frozenset(e.name for e in entries)
+    except OSError:
+        return frozenset()
+
+@lru_cache(maxsize=8)
+def find_favicon(static_path, name):
+    """
+    Finds the favicon file in static/img (ico, png or svg).
+    The result is cached - static files do not change while the app runs.
+
+    Returns:
+        str: path relative to static folder or None
+    """
+    present = _static_img_files(static_path)
+    for ext in ['ico', 'png', 'svg']:
+        if f'{name}.{ext}' in present:
+            return os.path.join('img', f'{name}.{ext}')
+    return None
 
 @app.context_processor
 def inject_assets():
@@ -103,18 +171,9 @@ def inject_assets():
         dict: variables for the rendering engine
     """
     static_path = app.static_folder
-
-    def find_favicon(name):
-        for ext in ['ico', 'png', 'svg']:
-            filename = os.path.join('img', f'{name}.{ext}')
-            full_path = os.path.join(static_path, filename)
-            if os.path.exists(full_path):
-                return filename
-        return None
-
     return {
-        "favicon_light": find_favicon("favicon"),
-        "favicon_dark": find_favicon("favicon-dark"),
+        "favicon_light": find_favicon(static_path, "favicon"),
+        "favicon_dark": find_favicon(static_path, "favicon-dark"),
     }
 @app.route("/")
 @login_required
@@ -139,7 +198,9 @@ def login():
         password = request.form.get('password', '')
 
         user_rec = _users.get(username)
-        if user_rec and check_password_hash(user_rec["password"], password):
+        # heslo ověřujeme vždy (u neznámého jména proti cizímu hashi), aby doba odpovědi neprozradila existenci účtu
+        password_ok = check_password_hash(user_rec["password"] if user_rec else pwUser, password)
+        if user_rec and password_ok:
             user = User(username)
             login_user(user)
             flash("Přihlášení proběhlo úspěšně.", "success")
@@ -169,11 +230,8 @@ def logout():
 @app.route('/api/sensors')
 @login_required
 def api_sensors():
-    with SqlSensorData() as db:
-        ids = db.get_sensor_ids()
-
     query = getQueryDataSensors()
-    response = [{"id": sensor_id, "name": sensor_map.get(sensor_id, sensor_id)} for sensor_id in ids]
+    response = get_sensors_list()
     return make_api_response(query, response, log=True)
 
 
@@ -184,7 +242,7 @@ def api_latest(sensor_id):
         data = db.get_current(sensor_id)
 
     if data:
-        d = dict(data)
+        d = data
         d["dew_point"] = compute_dew_point(d.get("temperature"), d.get("humidity"))
     else:
         d = {}
@@ -205,7 +263,7 @@ def api_aggregate_level(sensor_id, level, key):
     tzinfo = resolve_tz(tz_name, tz_offset)
     # ziskej data podle pozadovane urovne a vybraného období
     errorCode, errorMessage, result, start_iso, end_iso, group_by = api_aggregate(sensor_id, level, key, tzinfo)
-    print("Aggregate", sensor_id, level, key, start_iso, end_iso, group_by)
+    logger.debug("Aggregate %s %s %s %s %s %s", sensor_id, level, key, start_iso, end_iso, group_by)
     query = getQueryDataAggregate(sensor_id, level, key, tz_name, tz_offset, tzinfo, start_iso, end_iso, group_by)
     if errorCode is not None:
         # nastala chyba -> zamitava odpoved
@@ -309,9 +367,13 @@ if __name__ == "__main__":
     signal.signal(signal.SIGTERM, handle_sig)  # kill
 
     try:
-        # Flask aplikace
-        app.run(debug=True, use_reloader=False)
-        # app.run(debug=False)   # produkční režim
+        if serve is not None:
+            # produkční WSGI server - požadavky obsluhuje SERVER_THREADS vláken
+            logger.info("Serving with waitress (%d threads)", SERVER_THREADS)
+            serve(app, host=SERVER_HOST, port=SERVER_PORT, threads=SERVER_THREADS)
+        else:
+            # Flask aplikace (vývojový server)
+            app.run(host=SERVER_HOST, port=SERVER_PORT, debug=True, use_reloader=False, threaded=True)
     except Exception as e:
         logger.exception("App crashed: %s", e)
     finally:
@@ -12,14 +12,20 @@ SQLite database helper for sensor data
 Klíčové vlastnosti:
 - Interní výchozí `db_path` s možností přepsání v konstruktoru.
 - Bezpečné otevření/zavření spojení (explicitně i přes context manager).
-- `row_factory = sqlite3.Row` pro čitelné výsledky (dict-like).
+- Spojení se berou z poolu (`_ConnPool`) a po close()/opuštění `with` se do něj vrací,
+  takže request neotevírá a nezavírá SQLite soubor pokaždé znovu.
+- `row_factory = _dict_factory` → řádky výsledků jsou přímo dict (bez převodu sqlite3.Row → dict).
+  Jen privátní iterátory pro aggregate_service (`_iter_aggregated_rows`, `_iter_measurement_rows`)
+  vrací sqlite3.Row – řádek se nestaví jako Python dict, sloupce se čtou `row["název"]` v C.
 - Metody pro:
   - seznam dostupných senzorů (`get_sensor_ids`)
   - aktuální hodnoty (`get_current`)
-  - agregace (`get_aggregated`) podle `strftime` patternu (např. "%Y-%m-%d", "%Y-%m-%d %H")
-  - časové rozmezí měření (`get_measurements_range`)
+  - agregace (`get_aggregated`) podle `strftime` patternu (např. "%Y-%m-%d", "%Y-%m-%d %H");
+    minutové/hodinové/denní skupiny se počítají celočíselně ze sloupce ts_epoch
+  - časové rozmezí měření (`get_measurements_range`, po dávkách `iter_measurements_range`)
   - trvalé parametry (NV) – set/get/iterate s prefixem
   - aktuátor parametry – načtení, uložení jednotlivě i hromadně
+  - typované hodnoty parametrů (`encode_nv_value` / `decode_nv_value`)
 
 Kdy použít:
 - V API endpointu nebo servisní vrstvě pro čtení dat grafů/tabulek.
@@ -27,7 +33,7 @@ Kdy použít:
 
 Schéma očekávaných tabulek (tabulky zakládá měřící skript):
 - current_sensor_data(sensor_id TEXT, timestamp TEXT, temperature REAL, humidity REAL)
-- sensor_data(id INT, sensor_id TEXT, timestamp TEXT, temperature REAL, humidity REAL)
+- sensor_data(id INT, sensor_id TEXT, timestamp TEXT, temperature REAL, humidity REAL, ts_epoch INT)
 - nonvolatile_params(key TEXT PRIMARY KEY, value TEXT, updated_at TEXT DEFAULT CURRENT_TIMESTAMP)
 
 Příklady použití:
@@ -47,14 +53,310 @@ Příklady použití:
         db.close()
 
 Poznámky:
-- Parametr `group_by` v `get_aggregated` je přímo vložen do `strftime()`. Používej pouze bezpečné,
-  předem definované patterny (např. "%Y-%m-%d", "%Y-%m-%d %H") – nesmí pocházet od uživatele.
+- Parametr `group_by` v `get_aggregated` je přímo vložen do `strftime()`, proto jsou povoleny jen
+  předem definované patterny (`_AGGREGATE_PATTERNS`, shodné s services.time_utils); jiný → ValueError.
+- SQL dotazy jsou konstanty (u agregace jeden text na pattern) → spojení je opakovaně bere
+  z cache připravených příkazů (`cached_statements=STATEMENT_CACHE_SIZE`) bez nového parsování.
 """
 
 import sqlite3
 import os
+import logging
+import atexit
+import queue
+import re
+import threading
+import time
 from typing import Optional, Dict, Iterator, Tuple, Any, List
 
+DEFAULT_DB_PATH = '../data_db/sensors.db'
+
+logger = logging.getLogger("db")
+
+# PRAGMA nastavené pro každé nové spojení:
+# WAL (čtenáři neblokují zápis měřícího skriptu), NORMAL sync (ve WAL bezpečné, bez fsync při každém commitu),
+# dočasné tabulky v paměti, ~20 MB page cache a čtení DB souboru přes mmap (až 256 MB)
+_CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA mmap_size=268435456",
+)
+
+# kolik nečinných spojení na jednu db_path pool drží (víc souběžných spojení se po použití zavře)
+POOL_SIZE = 8
+
+# kolik řádků se z kurzoru načítá najednou při postupném čtení (fetchmany)
+FETCH_BATCH_SIZE = 1000
+
+# starší hodnoty bez typové značky: bool literály a tvar čísla (float jen s desetinnou tečkou, jako dřív)
+_NV_LEGACY_BOOLS = {"True": True, "False": False}
+_NV_INT_RE = re.compile(r"[+-]?\d+")
+_NV_FLOAT_RE = re.compile(r"[+-]?(?:\d+\.\d*|\.\d+)(?:[eE][+-]?\d+)?")
+
+# group_by patterny s pevnou délkou skupiny (v sekundách) -> seskupuje se celočíselně podle ts_epoch
+# (UTC epoch hranice minut/hodin/dnů odpovídají UTC kalendáři); měsíce mají různou délku -> zůstává strftime
+_BUCKET_SECONDS = {
+    "%Y-%m-%d %H:%M:00Z": 60,
+    "%Y-%m-%d %H:00:00Z": 3600,
+    "%Y-%m-%d 00:00:00Z": 86400,
+}
+
+# povolené group_by patterny pro get_aggregated (vkládají se přímo do SQL)
+_AGGREGATE_PATTERNS = frozenset(("%Y-%m", *_BUCKET_SECONDS))
+
+# db_path, u kterých už sensor_data má sloupec ts_epoch (doplňuje ho měřící skript)
+_EPOCH_COLUMN_PATHS: set = set()
+# db_path bez sloupce ts_epoch -> čas (monotonic) posledního ověření; znovu se ověří po EPOCH_COLUMN_RECHECK_TTL
+_EPOCH_COLUMN_MISSING: Dict[str, float] = {}
+EPOCH_COLUMN_RECHECK_TTL = 60.0
+
+# kolik připravených (zkompilovaných) SQL příkazů si každé spojení drží v cache
+STATEMENT_CACHE_SIZE = 256
+
+# upsert jednoho parametru do nonvolatile_params (nv_set i hromadné ukládání přes executemany)
+_NV_UPSERT_SQL = '''
+    INSERT INTO nonvolatile_params(key, value) VALUES (?, ?)
+    ON CONFLICT(key) DO UPDATE SET value=excluded.value, updated_at=CURRENT_TIMESTAMP
+'''
+
+# SQL dotazy jako konstanty -> stále stejný text, sqlite3 je najde v cache připravených příkazů
+_SQL_SENSOR_IDS = "SELECT sensor_id FROM current_sensor_data ORDER BY sensor_id"
+_SQL_CURRENT = """
+    SELECT timestamp, sensor_id, temperature, humidity
+    FROM current_sensor_data
+    WHERE sensor_id = ?
+"""
+_SQL_MEASUREMENTS_RANGE = """
+    SELECT
+        timestamp,
+        temperature,
+        humidity
+    FROM sensor_data
+    WHERE sensor_id = ?
+      AND timestamp >= ?
+      AND timestamp < ?
+    ORDER BY timestamp DESC
+"""
+_SQL_NV_GET = "SELECT value FROM nonvolatile_params WHERE key = ?"
+# prefix se hledá jako rozsah klíčů (key >= prefix AND key < prefix + max znak) -> využije index PRIMARY KEY
+_SQL_NV_ITER_PREFIXED = "SELECT key, value FROM nonvolatile_params WHERE key >= ? AND key < ?"
+# parametry aktuátorů: klíč "<prefix><name>-<param>" rozdělí přímo SQLite (klíče bez '-' za prefixem vynechá)
+_SQL_ACTUATOR_PARAMS = """
+    SELECT
+        substr(key, :start, instr(substr(key, :start), '-') - 1) AS name,
+        substr(key, :start + instr(substr(key, :start), '-')) AS param,
+        value
+    FROM nonvolatile_params
+    WHERE key >= :lo AND key < :hi
+      AND instr(substr(key, :start), '-') > 0
+"""
+
+# Hodnoty parametrů se ukládají jako text s typovou značkou "<tag>:<hodnota>"
+# (b = bool, i = int, f = float, s = str) -> při načtení stačí jeden lookup bez zkoušení převodů.
+_NV_DECODERS = {
+    "b": lambda s: s == "True",
+    "i": int,
+    "f": float,
+    "s": str,
+}
+
+
+def _dict_factory(cursor: sqlite3.Cursor, row: Tuple[Any, ...]) -> Dict[str, Any]:
+    """
+    row_factory pro sqlite3: vrací řádek rovnou jako dict {název_sloupce: hodnota}.
+    """
+    return {col[0]: value for col, value in zip(cursor.description, row)}
+
+
+def _prefix_range(prefix: str) -> Tuple[str, str]:
+    """
+    Vrátí rozsah (lo, hi) klíčů začínajících na prefix pro dotaz `key >= lo AND key < hi`.
+    """
+    return prefix, prefix + "\U0010ffff"
+
+
+def _build_aggregate_sql(group_by: str, bucketed: bool) -> str:
+    """
+    Sestaví SQL pro get_aggregated (volá se jen při importu, viz _AGGREGATE_SQL).
+    bucketed=True → seskupení podle ts_epoch / ? (řádky bez ts_epoch se dopočítají z timestamp).
+    """
+    if bucketed:
+        return f"""
+            SELECT
+                strftime('{group_by}', MIN(timestamp)) AS key,
+                ROUND(AVG(temperature), 2) AS avg_temp,
+                ROUND(AVG(humidity), 2) AS avg_hum,
+                COUNT(*) AS count
+            FROM sensor_data
+            WHERE sensor_id = ?
+              AND timestamp >= ?
+              AND timestamp < ?
+            GROUP BY COALESCE(ts_epoch, CAST(strftime('%s', timestamp) AS INTEGER)) / ?
+            ORDER BY key DESC
+        """
+    return f"""
+        SELECT
+            strftime('{group_by}', timestamp) AS key,
+            ROUND(AVG(temperature), 2) AS avg_temp,
+            ROUND(AVG(humidity), 2) AS avg_hum,
+            COUNT(*) AS count
+        FROM sensor_data
+        WHERE sensor_id = ?
+          AND timestamp >= ?
+          AND timestamp < ?
+        GROUP BY key
+        ORDER BY key DESC
+    """
+
+
+# hotové SQL texty agregace pro každý povolený (group_by, bucketed) - zároveň whitelist patternů
+_AGGREGATE_SQL: Dict[Tuple[str, bool], str] = {
+    (pattern, bucketed): _build_aggregate_sql(pattern, bucketed)
+    for pattern in _AGGREGATE_PATTERNS
+    for bucketed in (False, True)
+    if not bucketed or pattern in _BUCKET_SECONDS
+}
+
+
+def _aggregate_sql(group_by: str, bucketed: bool) -> str:
+    """
+    Vrátí připravený SQL text agregace; pro nepovolený group_by zvedne ValueError.
+    """
+    try:
+        return _AGGREGATE_SQL[(group_by, bucketed)]
+    except KeyError:
+        raise ValueError(f"Unsupported group_by pattern: {group_by}") from None
+
+
+def _connect(db_path: str, check_same_thread: bool = True) -> sqlite3.Connection:
+    """
+    Otevře nové spojení k SQLite DB a nastaví row_factory tak, aby řádky byly dict.
+    Zvedne FileNotFoundError, pokud soubor neexistuje.
+    Bez detect_types: timestamp je TEXT a vrací se jako str (převod na datetime dělá až time_utils).
+    """
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Databázový soubor '{db_path}' neexistuje.")
+    conn = sqlite3.connect(
+        db_path,
+        check_same_thread=check_same_thread,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    conn.row_factory = _dict_factory
+    for pragma in _CONNECTION_PRAGMAS:
+        try:
+            conn.execute(pragma)
+        except sqlite3.Error:
+            # např. journal_mode při zamčené DB - pokračujeme s výchozím nastavením
+            pass
+    return conn
+
+
+class _ConnPool:
+    """
+    Pool otevřených spojení (LIFO fronta pro každou db_path).
+    Spojení používá vždy jen jeden SqlSensorData najednou; mezi vlákny se může předávat
+    (proto check_same_thread=False).
+    """
+    def __init__(self, maxsize: int) -> None:
+        self._maxsize = maxsize
+        self._queues: Dict[str, "queue.LifoQueue[sqlite3.Connection]"] = {}
+        self._lock = threading.Lock()
+
+    def _queue(self, db_path: str) -> "queue.LifoQueue[sqlite3.Connection]":
+        q = self._queues.get(db_path)
+        if q is None:
+            with self._lock:
+                q = self._queues.setdefault(db_path, queue.LifoQueue(maxsize=self._maxsize))
+        return q
+
+    def acquire(self, db_path: str) -> sqlite3.Connection:
+        """
+        Vrátí nečinné spojení z poolu, případně otevře nové.
+        """
+        try:
+            return self._queue(db_path).get_nowait()
+        except queue.Empty:
+            return _connect(db_path, check_same_thread=False)
+
+    def release(self, db_path: str, conn: sqlite3.Connection) -> None:
+        """
+        Vrátí spojení do poolu (rozpracovanou transakci nejdřív vrátí zpět); pokud je pool plný, spojení zavře.
+        """
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._queue(db_path).put_nowait(conn)
+        except (queue.Full, sqlite3.Error):
+            conn.close()
+
+    def close_all(self) -> None:
+        """
+        Zavře všechna nečinná spojení v poolu.
+        """
+        with self._lock:
+            queues = list(self._queues.values())
+        for q in queues:
+            while True:
+                try:
+                    conn = q.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+
+_POOL = _ConnPool(POOL_SIZE)
+atexit.register(_POOL.close_all)
+
+
+def encode_nv_value(value: Any) -> str:
+    """
+    Převede hodnotu parametru na text s typovou značkou (např. True → "b:True", 21.5 → "f:21.5").
+    """
+    if isinstance(value, bool):
+        return f"b:{value}"
+    if isinstance(value, int):
+        return f"i:{value}"
+    if isinstance(value, float):
+        return f"f:{value}"
+    return f"s:{value}"
+
+
+def _decode_nv_legacy(raw: str) -> Any:
+    """
+    Převod hodnot uložených bez typové značky (starší formát): True/False → bool, čísla → int/float, jinak str.
+    Typ se pozná podle regexu (bez zkoušení převodů přes výjimky); float musí obsahovat desetinnou tečku.
+    """
+    value = _NV_LEGACY_BOOLS.get(raw)
+    if value is not None:
+        return value
+    if _NV_INT_RE.fullmatch(raw):
+        return int(raw)
+    if _NV_FLOAT_RE.fullmatch(raw):
+        return float(raw)
+    return raw
+
+
+def decode_nv_value(raw: Optional[str]) -> Any:
+    """
+    Převede text z nonvolatile_params zpět na hodnotu podle typové značky.
+    Hodnoty bez značky (starší formát) převádí postaru; None vrací jako None.
+    """
+    if raw is None:
+        return None
+    decoder = _NV_DECODERS.get(raw[:1]) if raw[1:2] == ":" else None
+    if decoder is None:
+        return _decode_nv_legacy(raw)
+    try:
+        return decoder(raw[2:])
+    except ValueError:
+        return _decode_nv_legacy(raw)
+
+
 class SqlSensorData:
     """
     Db helper s interně uloženou výchozí db_path.
@@ -74,8 +376,10 @@ class SqlSensorData:
 
     Vlastnosti:
     - conn: sqlite3.Connection | None – aktivní spojení (po open())
+
+    Spojení pochází z poolu; close() ho do poolu vrací (nezavírá).
     """
-    def __init__(self, db_path: str = '../data_db/sensors.db') -> None:
+    def __init__(self, db_path: str = DEFAULT_DB_PATH) -> None:
         self._db_path: str = db_path
         self.conn: Optional[sqlite3.Connection] = None
 
@@ -84,28 +388,22 @@ class SqlSensorData:
     # -------------------------------------------------
     def open(self) -> None:
         """
-        Otevře spojení k SQLite DB, nastaví row_factory pro dict-like přístup.
+        Převezme spojení k SQLite DB z poolu (případně otevře nové, row_factory vrací dict).
         Zvedne FileNotFoundError, pokud soubor neexistuje.
         Idempotentní: pokud je spojení již otevřené, neprovede nic.
         """
         if self.conn:
             return
-        if not os.path.exists(self._db_path):
-            raise FileNotFoundError(f"Databázový soubor '{self._db_path}' neexistuje.")
-        self.conn = sqlite3.connect(
-            self._db_path,
-            detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES
-        )
-        self.conn.row_factory = sqlite3.Row
+        self.conn = _POOL.acquire(self._db_path)
 
     def close(self) -> None:
         """
-        Bezpečně zavře spojení, pokud existuje.
-        Po zavření nastaví conn na None.
+        Uvolní spojení, pokud existuje - vrátí ho do poolu (nedokončenou transakci vrátí zpět).
+        Po uvolnění nastaví conn na None.
         """
         if self.conn:
             try:
-                self.conn.close()
+                _POOL.release(self._db_path, self.conn)
             finally:
                 self.conn = None
 
@@ -115,14 +413,14 @@ class SqlSensorData:
     def __enter__(self) -> "SqlSensorData":
         """
         Umožní použití `with SqlSensorData(...) as db:`.
-        Při vstupu otevře spojení a vrátí instanci.
+        Při vstupu převezme spojení z poolu a vrátí instanci.
         """
         self.open()
         return self
 
     def __exit__(self, exc_type: Optional[type], exc_value: Optional[BaseException], traceback: Optional[Any]) -> None:
         """
-        Při opuštění kontextu zavře spojení.
+        Při opuštění kontextu vrátí spojení do poolu.
         """
         self.close()
 
@@ -134,75 +432,121 @@ class SqlSensorData:
         Vrátí seznam dostupných sensor_id z tabulky current_sensor_data.
         Výstup: list[str]
         """
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT sensor_id FROM current_sensor_data ORDER BY sensor_id")
-        return [row['sensor_id'] for row in cursor.fetchall()]
+        return [row['sensor_id'] for row in self.conn.execute(_SQL_SENSOR_IDS).fetchall()]
 
     def get_current(self, sensor_id: str) -> Optional[Dict[str, Any]]:
         """
         Vrátí aktuální měření pro konkrétní sensor_id z current_sensor_data.
-        Výstup: dict(row) nebo None, pokud záznam neexistuje.
+        Výstup: dict nebo None, pokud záznam neexistuje.
         """
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT timestamp, sensor_id, temperature, humidity
-            FROM current_sensor_data
-            WHERE sensor_id = ?
-        """, (sensor_id,))
-        row = cursor.fetchone()
-        return dict(row) if row else None
+        return self.conn.execute(_SQL_CURRENT, (sensor_id,)).fetchone()
 
     def get_aggregated(self, sensor_id: str, start_iso: str, end_iso: str, group_by: str) -> List[Dict[str, Any]]:
         """
         Vrátí agregovaná data ze sensor_data pro daný senzor a časový interval.
-        Agreguje pomocí AVG(temperature), AVG(humidity) a COUNT(*).
-        Skupiny jsou definovány `strftime(group_by, timestamp)`.
+        Agreguje pomocí AVG(temperature), AVG(humidity) (zaokrouhleno na 2 místa už v SQL) a COUNT(*).
+        Skupiny jsou definovány `strftime(group_by, timestamp)`. Pro patterny s pevnou délkou
+        (viz _BUCKET_SECONDS) se seskupuje podle `ts_epoch / délka` a strftime se volá jen jednou na skupinu.
 
         Parametry:
         - sensor_id: ID senzoru
         - start_iso, end_iso: ISO časové řetězce (inclusive start, exclusive end)
-        - group_by: strftime pattern (např. "%Y-%m-%d %H")
+        - group_by: strftime pattern z _AGGREGATE_PATTERNS (jinak ValueError)
 
         Výstup: list[dict] se strukturou { key, avg_temp, avg_hum, count }
         Pozn.: ORDER BY key DESC vrací nejnovější skupiny jako první.
         """
+        rows = self.conn.execute(*self._aggregate_query(sensor_id, start_iso, end_iso, group_by)).fetchall()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("get_aggregated %s %s..%s %r: rows=%d", sensor_id, start_iso, end_iso, group_by, len(rows))
+        return rows
+
+    def _iter_aggregated_rows(self, sensor_id: str, start_iso: str, end_iso: str, group_by: str) -> Iterator[sqlite3.Row]:
+        """
+        Jako get_aggregated, ale generátor sqlite3.Row (bez stavby dict na řádek) - jen pro aggregate_service.
+        Generátor je nutné dočerpat, dokud je spojení otevřené (uvnitř `with`).
+        """
+        return self._iter_rows(*self._aggregate_query(sensor_id, start_iso, end_iso, group_by), row_factory=sqlite3.Row)
+
+    def _aggregate_query(self, sensor_id: str, start_iso: str, end_iso: str, group_by: str) -> Tuple[str, Tuple[Any, ...]]:
+        """
+        Vybere SQL agregace (celočíselné skupiny podle ts_epoch, pokud to pattern i DB umožní) a jeho parametry.
+        """
+        bucket = _BUCKET_SECONDS.get(group_by)
+        if bucket and self._has_epoch_column():
+            return _aggregate_sql(group_by, True), (sensor_id, start_iso, end_iso, bucket)
+        return _aggregate_sql(group_by, False), (sensor_id, start_iso, end_iso)
+
+    def _iter_rows(self, sql: str, params: Tuple[Any, ...], batch_size: int = FETCH_BATCH_SIZE,
+                   row_factory=None) -> Iterator[Any]:
+        """
+        Generátor řádků dotazu načítaných po dávkách (fetchmany).
+        row_factory=None → výchozí factory spojení (dict), jinak např. sqlite3.Row jen pro tento kurzor.
+        """
         cursor = self.conn.cursor()
-        sql = f"""
-            SELECT
-                strftime('{group_by}', timestamp) AS key,
-                AVG(temperature) AS avg_temp,
-                AVG(humidity) AS avg_hum,
-                COUNT(*) AS count
-            FROM sensor_data
-            WHERE sensor_id = ?
-              AND timestamp >= ?
-              AND timestamp < ?
-            GROUP BY key
-            ORDER BY key DESC
+        if row_factory is not None:
+            cursor.row_factory = row_factory
+        cursor.arraysize = batch_size
+        cursor.execute(sql, params)
+        try:
+            while True:
+                rows = cursor.fetchmany()
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            # i při nedočerpání generátoru hned uvolní SQLite statement
+            cursor.close()
+
+    def _has_epoch_column(self) -> bool:
+        """
+        Zjistí (a pro db_path si zapamatuje), zda sensor_data obsahuje sloupec ts_epoch.
+        Kladný výsledek se cachuje trvale; záporný jen na EPOCH_COLUMN_RECHECK_TTL sekund
+        (měřící skript může sloupec doplnit později).
+        """
+        if self._db_path in _EPOCH_COLUMN_PATHS:
+            return True
+        now = time.monotonic()
+        checked = _EPOCH_COLUMN_MISSING.get(self._db_path)
+        if checked is not None and now - checked < EPOCH_COLUMN_RECHECK_TTL:
+            return False
+        if any(row['name'] == 'ts_epoch' for row in self.conn.execute("PRAGMA table_info(sensor_data)").fetchall()):
+            _EPOCH_COLUMN_PATHS.add(self._db_path)
+            _EPOCH_COLUMN_MISSING.pop(self._db_path, None)
+            return True
+        _EPOCH_COLUMN_MISSING[self._db_path] = now
+        return False
+
+    def iter_measurements_range(self, sensor_id: str, start_iso: str, end_iso: str,
+                                batch_size: int = FETCH_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+        """
+        Postupně (generátor) vrací surová měření z tabulky sensor_data pro daný senzor v intervalu.
+        Řádky se z DB načítají po dávkách (fetchmany), celý výsledek tedy nikdy není v paměti najednou.
+        Výstup je seřazen DESC podle timestamp (nejnovější první).
+        Generátor je nutné dočerpat, dokud je spojení otevřené (uvnitř `with`).
+
+        Výstup: iterator dictů se strukturou { timestamp, temperature, humidity }
+        """
+        yield from self._iter_rows(_SQL_MEASUREMENTS_RANGE, (sensor_id, start_iso, end_iso), batch_size)
+
+    def _iter_measurement_rows(self, sensor_id: str, start_iso: str, end_iso: str,
+                               batch_size: int = FETCH_BATCH_SIZE) -> Iterator[sqlite3.Row]:
+        """
+        Jako iter_measurements_range, ale generátor sqlite3.Row (bez stavby dict na řádek) - jen pro aggregate_service.
         """
-        cursor.execute(sql, (sensor_id, start_iso, end_iso))
-        return [dict(r) for r in cursor.fetchall()]
+        return self._iter_rows(_SQL_MEASUREMENTS_RANGE, (sensor_id, start_iso, end_iso), batch_size, row_factory=sqlite3.Row)
 
     def get_measurements_range(self, sensor_id: str, start_iso: str, end_iso: str) -> List[Dict[str, Any]]:
         """
-        Vrátí surová měření z tabulky sensor_data pro daný senzor v intervalu.
+        Vrátí surová měření z tabulky sensor_data pro daný senzor v intervalu jako list.
         Výstup je seřazen DESC podle timestamp (nejnovější první).
 
         Výstup: list[dict] se strukturou { timestamp, temperature, humidity }
         """
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT
-                timestamp,
-                temperature,
-                humidity
-            FROM sensor_data
-            WHERE sensor_id = ?
-              AND timestamp >= ?
-              AND timestamp < ?
-            ORDER BY timestamp DESC
-        """, (sensor_id, start_iso, end_iso))
-        return [dict(r) for r in cursor.fetchall()]
+        rows = list(self.iter_measurements_range(sensor_id, start_iso, end_iso))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("get_measurements_range %s %s..%s: rows=%d", sensor_id, start_iso, end_iso, len(rows))
+        return rows
 
     # -------------------------
     # Params (nonvolatile) metody
@@ -214,11 +558,7 @@ class SqlSensorData:
         """
         if not self.conn:
             raise RuntimeError("DB connection is not open")
-        cur = self.conn.cursor()
-        cur.execute('''
-            INSERT INTO nonvolatile_params(key, value) VALUES (?, ?)
-            ON CONFLICT(key) DO UPDATE SET value=excluded.value, updated_at=CURRENT_TIMESTAMP
-        ''', (key, value))
+        self.conn.execute(_NV_UPSERT_SQL, (key, value))
         self.conn.commit()
 
     def nv_get(self, key: str) -> Optional[str]:
@@ -228,10 +568,8 @@ class SqlSensorData:
         """
         if not self.conn:
             raise RuntimeError("DB connection is not open")
-        cur = self.conn.cursor()
-        cur.execute('SELECT value FROM nonvolatile_params WHERE key = ?', (key,))
-        row = cur.fetchone()
-        return row[0] if row else None
+        row = self.conn.execute(_SQL_NV_GET, (key,)).fetchone()
+        return row['value'] if row else None
 
     def nv_iter_prefixed(self, prefix: str) -> Iterator[Tuple[str, str]]:
         """
@@ -240,10 +578,8 @@ class SqlSensorData:
         """
         if not self.conn:
             raise RuntimeError("DB connection is not open")
-        cur = self.conn.cursor()
-        cur.execute('SELECT key, value FROM nonvolatile_params WHERE key LIKE ?', (f'{prefix}%',))
-        for k, v in cur.fetchall():
-            yield k, v
+        for row in self.conn.execute(_SQL_NV_ITER_PREFIXED, _prefix_range(prefix)).fetchall():
+            yield row['key'], row['value']
 
     # -------------------------
     # Helpers pro actuatory
@@ -251,54 +587,39 @@ class SqlSensorData:
     def load_actuator_params(self, prefix: str = 'actuator-') -> Dict[str, Dict[str, Any]]:
         """
         Načte všechny parametry aktuátorů z nonvolatile_params s daným prefixem.
-        Očekávaný formát klíče: f"{prefix}{name}-{param}"
-        Provádí základní převody typů (True/False → bool, čísla → int/float, jinak str).
+        Očekávaný formát klíče: f"{prefix}{name}-{param}" (rozdělení na name/param dělá SQL dotaz,
+        klíče bez '-' za prefixem se ignorují)
+        Hodnoty převádí podle typové značky (viz decode_nv_value).
 
         Výstup: dict[name] -> dict[param] = parsed_value
         """
+        if not self.conn:
+            raise RuntimeError("DB connection is not open")
+        lo, hi = _prefix_range(prefix)
+        rows = self.conn.execute(_SQL_ACTUATOR_PARAMS, {"start": len(prefix) + 1, "lo": lo, "hi": hi}).fetchall()
         out: Dict[str, Dict[str, Any]] = {}
-        for key, raw in self.nv_iter_prefixed(prefix):
-            suffix = key[len(prefix):]
-            try:
-                name, param = suffix.split("-", 1)
-            except Exception:
-                # Ignoruj klíče bez očekávaného formátu
-                continue
-
-            val = raw
-            if val in ("True", "False"):
-                parsed = (val == "True")
-            else:
-                try:
-                    if "." in val:
-                        parsed = float(val)
-                    else:
-                        parsed = int(val)
-                except Exception:
-                    parsed = val
-
-            out.setdefault(name, {})[param] = parsed
+        for row in rows:
+            out.setdefault(row['name'], {})[row['param']] = decode_nv_value(row['value'])
         return out
 
     def save_actuator_param(self, name: str, param: str, value: Any, prefix: str = 'actuator-') -> None:
         """
-        Uloží jeden parametr aktuátoru pod klíč f"{prefix}{name}-{param}" jako str.
+        Uloží jeden parametr aktuátoru pod klíč f"{prefix}{name}-{param}" jako text s typovou značkou.
         """
         key = f"{prefix}{name}-{param}"
-        self.nv_set(key, str(value))
+        self.nv_set(key, encode_nv_value(value))
 
     def save_actuator_params_bulk(self, params: Dict[str, Dict[str, Any]], prefix: str = 'actuator-') -> None:
         """
         Hromadně uloží více parametrů aktuátorů.
         Očekávaný vstup: { name: { param: value, ... }, ... }
-        Každou hodnotu ukládá jako str; případné výjimky loguje přes print (zvaž přechod na logger).
+        Každou hodnotu ukládá jako text s typovou značkou. Vše jde jedním executemany v jediné
+        transakci (jeden commit); při chybě se vrátí celá dávka a výjimka se propaguje volajícímu.
         """
-        for name, kv in params.items():
-            for p, v in kv.items():
-                try:
-                    param_name = f"{prefix}{name}-{p}"
-                    value = str(v)
-                    self.nv_set(param_name, value)
-                except Exception as ex:
-                    # Pro produkci zvaž nahradit print za logger.warning/error
-                    print(ex)
+        if not self.conn:
+            raise RuntimeError("DB connection is not open")
+        rows = [(f"{prefix}{name}-{p}", encode_nv_value(v)) for name, kv in params.items() for p, v in kv.items()]
+        if not rows:
+            return
+        with self.conn:
+            self.conn.executemany(_NV_UPSERT_SQL, rows)
@@ -8,6 +8,7 @@ Logger configuration module
 - Poskytuje idempotentní nastavení loggeru (nepřidává duplicitní handlery).
 - Umožňuje rotující souborové logování a volitelný konzolový výstup.
 - Zajišťuje jednotný formát log řádků napříč aplikací.
+- Zápis do souboru/konzole neblokuje volající vlákno (QueueHandler + QueueListener).
 
 Kdy použít:
 - Při startu aplikace (např. v main.py) pro nastavení root loggeru.
@@ -18,6 +19,9 @@ Klíčové vlastnosti:
 - StreamHandler volitelně pro psaní do konzole.
 - Bezpečné opakované volání bez duplicit (idempotence).
 - Graceful handling: při nemožnosti vytvoření file handleru běží dál s konzolí.
+- Logger má jen QueueHandler (záznam se pouze vloží do fronty); soubor a konzoli obsluhuje
+  QueueListener ve vlastním vlákně → request nečeká na disk ani na rotaci souboru.
+  Listener je jeden pro každý konfigurovaný logger a zastaví se (vyprázdní frontu) při ukončení procesu.
 
 Příklad použití:
     from logger_config import configure_logging
@@ -39,15 +43,39 @@ Příklad použití:
     api_logger.debug("Inicializace API klienta")
 """
 
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
-from typing import Optional
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, List, Optional, Set, Tuple
 
 DEFAULT_LOG_FILE = "./app.log"
 DEFAULT_MAX_BYTES = 1_000_000
 DEFAULT_BACKUP_COUNT = 5
 DEFAULT_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
 
+# běžící QueueListener pro každý konfigurovaný logger ("" = root)
+_listeners: Dict[str, QueueListener] = {}
+
+# již přidané handlery pro každý logger: ("file", cesta) / ("console", "") -> kontrola duplicit je O(1)
+_configured_handlers: Dict[str, Set[Tuple[str, str]]] = {}
+
+
+def _get_listener(target: logging.Logger, key: str) -> QueueListener:
+    """
+    Vrátí QueueListener daného loggeru; při prvním volání připojí k loggeru QueueHandler
+    a listener spustí (zastavení je registrované přes atexit).
+    """
+    listener = _listeners.get(key)
+    if listener is None:
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        target.addHandler(QueueHandler(log_queue))
+        listener = QueueListener(log_queue, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        _listeners[key] = listener
+    return listener
+
 
 def configure_logging(
     *,
@@ -85,8 +113,10 @@ def configure_logging(
     - logging.Logger: Konfigurovaný logger (root nebo pojmenovaný).
 
     Idempotence a bezpečnost:
+    - File/console handlery se přidávají do QueueListeneru loggeru (logger sám má jen QueueHandler).
     - RotatingFileHandler přidá pouze, pokud pro daný soubor ještě neexistuje.
     - StreamHandler přidá pouze, pokud žádný konzolový handler není.
+    - Přidané handlery se evidují v množině (_configured_handlers) → kontrola bez procházení handlerů.
     - Pokud nelze vytvořit file handler (např. kvůli právům nebo neexistující cestě),
       výjimka se nezvedá a konfigurace pokračuje (konzolové logování zůstává).
     """
@@ -99,13 +129,13 @@ def configure_logging(
 
     formatter = logging.Formatter(fmt)
 
+    key = logger_name or ""
+    listener = _get_listener(target, key)
+    configured = _configured_handlers.setdefault(key, set())
+    handlers: List[logging.Handler] = list(listener.handlers)
+
     # Přidej file handler jen pokud ještě neexistuje handler pro daný soubor
-    existing_filepaths = {
-        getattr(h, "baseFilename", None)
-        for h in target.handlers
-        if isinstance(h, RotatingFileHandler)
-    }
-    if log_file not in existing_filepaths:
+    if ("file", log_file) not in configured:
         try:
             fh = RotatingFileHandler(
                 log_file,
@@ -114,7 +144,8 @@ def configure_logging(
             )
             fh.setLevel(level)
             fh.setFormatter(formatter)
-            target.addHandler(fh)
+            handlers.append(fh)
+            configured.add(("file", log_file))
         except Exception:
             # Pokud nelze vytvořit file handler (práva, cesta),
             # ignoruj a pokračuj; console handler může pomoci při ladění.
@@ -122,11 +153,14 @@ def configure_logging(
 
     # Přidej console handler pokud žádný neexistuje a console=True
     if console:
-        has_console = any(isinstance(h, logging.StreamHandler) for h in target.handlers)
-        if not has_console:
+        if ("console", "") not in configured:
             ch = logging.StreamHandler()
             ch.setLevel(level)
             ch.setFormatter(formatter)
-            target.addHandler(ch)
+            handlers.append(ch)
+            configured.add(("console", ""))
+
+    # listener čte handlers při každém záznamu -> stačí vyměnit n-tici
+    listener.handlers = tuple(handlers)
 
     return target
@@ -13,10 +13,13 @@ Závislosti:
 - services.time_utils (resolve_tz, parse_local_key_to_range, to_local_iso_from_utc)
 - db.SqlSensorData (přístup k SQLite databázi)
 - math (logaritmus pro výpočet rosného bodu)
+- numpy (volitelně, vektorový výpočet rosného bodu pro celou dávku řádků)
+- numba (volitelně, kompilovaná smyčka rosného bodu místo NumPy výrazů; vyžaduje numpy)
 
 Hlavní rozhraní:
 - `handle_aggregate(...)` → vrací list dictů s agregovanými nebo raw daty.
 - `api_aggregate(...)` → API wrapper, vrací tuple (status, message, result, start_iso, end_iso, group_by).
+  Agregace (ne raw) pro již uzavřená období (end_iso aspoň AGGREGATE_CLOSED_GRACE v minulosti) jsou cachované – data se v nich nemění.
 
 Výstupní formát dat:
 {
@@ -28,31 +31,45 @@ Výstupní formát dat:
 }
 """
 
-from datetime import datetime, timezone
-from services.time_utils import parse_local_key_to_range, to_utc, parse_local_iso, shorten_key_by_level
+from datetime import datetime, timedelta, timezone
+from services.time_utils import parse_local_key_to_range, to_utc, parse_local_iso, shorten_key_by_level, to_sql_datetime
 from db import SqlSensorData
 import math
+from functools import lru_cache
 from typing import Optional, Dict, Any, List, Tuple
 
-
-def _round2(value: Optional[float]) -> Optional[float]:
-    """
-    Zaokrouhlí hodnotu na 2 desetinná místa.
-    Vrací None pokud vstup je None.
-
-    Parametry:
-    - value: číslo nebo None
-
-    Návratová hodnota:
-    - float nebo None
-    """
-    return round(value, 2) if value is not None else None
-
-
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+try:
+    from numba import njit
+except Exception:
+    njit = None
+
+# Magnus-Tetens konstanty pro výpočet rosného bodu
+_DEW_A = 17.27
+_DEW_B = 237.7
+_log = math.log
+
+# počet cachovaných výsledků agregace pro uzavřená období
+AGGREGATE_CACHE_SIZE = 1024
+# úrovně, jejichž výsledky pro uzavřená období se cachují; raw (seznam všech měření) ne - byl by velký
+AGGREGATE_CACHED_LEVELS = frozenset(("monthly", "daily", "hourly", "minutely"))
+# období se považuje za uzavřené (a cachuje) až AGGREGATE_CLOSED_GRACE po svém konci - měření
+# s časem těsně před koncem může být zapsané až po něm (interval měření 3 s + čtení DHT s opakováním)
+AGGREGATE_CLOSED_GRACE = timedelta(seconds=30)
+# počet cachovaných převodů klíče agregace na lokální ISO (hodinové klíče měsíce ~744)
+LOCALIZED_KEY_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=4096)
 def compute_dew_point(temp_c: Optional[float], humidity: Optional[float]) -> Optional[float]:
     """
     Výpočet rosného bodu (°C) z teploty a relativní vlhkosti.
     Vrací None pokud vstupy nejsou validní.
+    Výsledek je cachovaný - DHT11 měří v celých °C a %, takže se vstupy stále opakují.
 
     Parametry:
     - temp_c: teplota v °C
@@ -64,58 +81,156 @@ def compute_dew_point(temp_c: Optional[float], humidity: Optional[float]) -> Opt
     if temp_c is None or humidity is None:
         return None
     try:
-        a, b = 17.27, 237.7
-        gamma = (a * temp_c) / (b + temp_c) + math.log(humidity / 100.0)
-        return round((b * gamma) / (a - gamma), 2)
+        gamma = (_DEW_A * temp_c) / (_DEW_B + temp_c) + _log(humidity / 100.0)
+        return round((_DEW_B * gamma) / (_DEW_A - gamma), 2)
     except Exception:
         return None
 
 
-def _normalize_row(column_key, column_temp, column_hum, column_count, row: Dict[str, Any], tzinfo=timezone.utc) -> Dict[str, Any]:
+if njit is not None and np is not None:
+    @njit(cache=True, error_model="numpy")
+    def _dew_kernel(t, h, out):
+        """
+        Rosný bod pro pole t/h do out v jedné kompilované smyčce (bez mezivýsledků NumPy výrazů).
+        Nevalidní vstup (nan, vlhkost <= 0) → nan. fastmath se nepoužívá - LLVM by s ním předpokládal,
+        že nan nenastane, a vypustil by ošetření nevalidního vstupu (→ nan).
+        """
+        for i in range(t.shape[0]):
+            ti = t[i]
+            hi = h[i]
+            if hi > 0.0 and ti == ti:
+                gamma = (_DEW_A * ti) / (_DEW_B + ti) + math.log(hi / 100.0)
+                out[i] = (_DEW_B * gamma) / (_DEW_A - gamma)
+            else:
+                out[i] = math.nan
+else:
+    _dew_kernel = None
+
+
+def compute_dew_points(temps: List[Optional[float]], hums: List[Optional[float]]) -> List[Optional[float]]:
     """
-    Normalizuje řádek z get_aggregated nebo jednotlivá měření:
-    - převede zkrácený key na plné ISO UTC
-    - zaokrouhlí průměry na 2 desetinná místa
-    - doplní rosný bod
+    Dávkový výpočet rosného bodu (°C) pro celé pole hodnot (např. všechny řádky agregace).
+    Pokud je dostupná numba, počítá se kompilovanou smyčkou _dew_kernel, s NumPy vektorově;
+    jinak po prvcích přes compute_dew_point.
+    Pro nevalidní vstupy (None, vlhkost <= 0) vrací na dané pozici None.
 
     Parametry:
-    - column_key: název sloupce pro klíč (např. "key")
-    - column_temp: název sloupce pro teplotu (např. "avg_temp" nebo "temperature")
-    - column_hum: název sloupce pro vlhkost (např. "avg_hum" nebo "humidity")
-    - column_count: název sloupce pro počet (např. "count")
-    - row: dict s daty
-    - tzinfo: časová zóna (default UTC)
+    - temps: teploty v °C
+    - hums: relativní vlhkosti v %
 
     Návratová hodnota:
-    - dict { key, temperature, humidity, dew_point, count }
+    - list float (rosný bod °C, zaokrouhleno na 2 místa) nebo None
     """
-    raw_key = row.get(column_key)
-    if raw_key:
-        # parse_local_iso zvládne i zkrácené formáty (YYYY-MM, YYYY-MM-DD, YYYY-MM-DDTHH)
-        local_dt = parse_local_iso(raw_key, tzinfo)
-        key = local_dt.isoformat(timespec="seconds")  # "2025-11-14T22:00:00+00:00"
+    if np is None or not temps:
+        return [compute_dew_point(t, h) for t, h in zip(temps, hums)]
+
+    t = np.array(temps, dtype=np.float64)       # None -> nan
+    h = np.array(hums, dtype=np.float64)
+    if _dew_kernel is not None:
+        dew = np.empty_like(t)
+        _dew_kernel(t, h, dew)
     else:
-        key = None
+        with np.errstate(divide="ignore", invalid="ignore"):
+            gamma = (_DEW_A * t) / (_DEW_B + t) + np.log(h / 100.0)
+            dew = (_DEW_B * gamma) / (_DEW_A - gamma)
+    valid = np.isfinite(dew)
+    return [round(v, 2) if ok else None for v, ok in zip(dew.tolist(), valid.tolist())]
+
+
+def _fill_dew_points(result: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Doplní do normalizovaných řádků rosný bod spočtený jednou dávkou.
+    """
+    dews = compute_dew_points([r["temperature"] for r in result], [r["humidity"] for r in result])
+    for r, dew in zip(result, dews):
+        r["dew_point"] = dew
+    return result
+
+
+def _parse_raw_key(raw_key: str, tzinfo) -> datetime:
+    # raw timestamp "YYYY-MM-DD HH:MM:SS" (bez zóny) -> stejně jako parse_local_iso: zóna tzinfo
+    return datetime.fromisoformat(raw_key).replace(tzinfo=tzinfo)
+
+
+def _parse_utc_key(raw_key: str, tzinfo) -> datetime:
+    # minutové/hodinové/denní klíče "YYYY-MM-DD HH:MM:SSZ" (UTC) -> převod do tzinfo
+    return datetime.fromisoformat(raw_key[:-1]).replace(tzinfo=timezone.utc).astimezone(tzinfo)
+
 
-    temp = _round2(row.get(column_temp))
-    hum = _round2(row.get(column_hum))
-    dew = _round2(compute_dew_point(temp, hum))
-    if column_count is None:
-        count = 1
+def _parse_month_key(raw_key: str, tzinfo) -> datetime:
+    # měsíční klíč "YYYY-MM" -> první den měsíce v tzinfo
+    return datetime(int(raw_key[:4]), int(raw_key[5:7]), 1, tzinfo=tzinfo)
+
+
+@lru_cache(maxsize=None)
+def _key_parser(group_by: Optional[str]):
+    """
+    Vybere podle group_by (None = raw) jeden přímý převod klíče na datetime, místo zkoušení
+    formátů v parse_local_iso. Pokud přímý převod selže, použije se parse_local_iso.
+    Pro každý group_by vrací stále stejnou funkci (patternů je pár) → může být klíčem _localized_key.
+    """
+    if group_by is None:
+        parse = _parse_raw_key
+    elif group_by.endswith("Z"):
+        parse = _parse_utc_key
+    elif group_by == "%Y-%m":
+        parse = _parse_month_key
     else:
-        count = int(row.get(column_count) or 0)
-    return {
-        "key": key,
-        "temperature": temp,
-        "humidity": hum,
-        "dew_point": dew,
-        "count": count,
-    }
-def _normalize_aggregated_row(row: Dict[str, Any], tzinfo=timezone.utc) -> Dict[str, Any]:
-    return _normalize_row("key", "avg_temp", "avg_hum", "count", row, tzinfo)
-
-def _normalize_measurement_row(row: Dict[str, Any], tzinfo=timezone.utc) -> Dict[str, Any]:
-    return _normalize_row("timestamp", "temperature", "humidity", None, row, tzinfo)
+        return parse_local_iso
+
+    def parse_key(raw_key: str, tzinfo) -> datetime:
+        try:
+            return parse(raw_key, tzinfo)
+        except ValueError:
+            return parse_local_iso(raw_key, tzinfo)
+    return parse_key
+
+
+@lru_cache(maxsize=LOCALIZED_KEY_CACHE_SIZE)
+def _localized_key(parse_key, raw_key: str, tzinfo) -> str:
+    """
+    Klíč agregace → lokální ISO string, cachované napříč requesty.
+    V jednom výsledku je každý klíč jen jednou, ale stejné skupiny (hlavně aktuální den/měsíc,
+    který se necachuje v _handle_aggregate_closed) se dotazují opakovaně.
+    """
+    return parse_key(raw_key, tzinfo).isoformat(timespec="seconds")
+
+
+def _normalize_rows(rows, column_key: str, column_temp: str, column_hum: str, column_count: Optional[str],
+                    tzinfo, parse_key, rounded: bool = False, cached_keys: bool = False) -> List[Dict[str, Any]]:
+    """
+    Normalizuje celý výsledek dotazu: jedna smyčka bez volání funkce na řádek,
+    globální jména (round, isoformat) navázaná předem na lokální proměnné.
+    rounded=True → hodnoty už zaokrouhlilo SQL (agregační dotaz), v Pythonu se nezaokrouhlují.
+    cached_keys=True → převod klíče přes _localized_key (jen agregace; raw časy se skoro neopakují).
+    dew_point je None - doplní ho _fill_dew_points jednou dávkou.
+    """
+    _round = round
+    _localize = _localized_key if cached_keys else None
+    result: List[Dict[str, Any]] = []
+    append = result.append
+    for row in rows:
+        raw_key = row[column_key]
+        temp = row[column_temp]
+        hum = row[column_hum]
+        if not rounded:
+            temp = None if temp is None else _round(temp, 2)
+            hum = None if hum is None else _round(hum, 2)
+        if not raw_key:
+            key = None
+        elif _localize is not None:
+            key = _localize(parse_key, raw_key, tzinfo)
+        else:
+            key = parse_key(raw_key, tzinfo).isoformat(timespec="seconds")
+        append({
+            "key": key,
+            "temperature": temp,
+            "humidity": hum,
+            "dew_point": None,
+            "count": 1 if column_count is None else int(row[column_count] or 0),
+        })
+    return result
+
 
 def handle_aggregate(sensor_id: str, level: str, key: str, start_iso: str, end_iso: str, group_by: Optional[str], tzinfo) -> List[Dict[str, Any]]:
     """
@@ -133,22 +248,32 @@ def handle_aggregate(sensor_id: str, level: str, key: str, start_iso: str, end_i
     """
     with SqlSensorData() as db:
         if level == "raw":
-            rows = db.get_measurements_range(sensor_id, start_iso, end_iso)
-            result = [_normalize_measurement_row(r, tzinfo) for r in rows]
-            return result
+            rows = db._iter_measurement_rows(sensor_id, start_iso, end_iso)
+            result = _normalize_rows(rows, "timestamp", "temperature", "humidity", None, tzinfo, _key_parser(None))
+            return _fill_dew_points(result)
 
         if not group_by:
             raise ValueError("Aggregation group_by is not defined for this level")
 
-        rows = db.get_aggregated(sensor_id, start_iso, end_iso, group_by)                
+        rows = db._iter_aggregated_rows(sensor_id, start_iso, end_iso, group_by)                
 
         if level == "daily":
             # ponecháme jen řádky, kde row["key"] začíná na krátký klíč
             short_key = shorten_key_by_level(level, key)
-            rows = [row for row in rows if row["key"].startswith(short_key)]            
+            rows = (row for row in rows if row["key"].startswith(short_key))            
         
-        result = [_normalize_aggregated_row(row, tzinfo ) for row in rows]
-        return result
+        result = _normalize_rows(rows, "key", "avg_temp", "avg_hum", "count", tzinfo, _key_parser(group_by), rounded=True, cached_keys=True)
+        return _fill_dew_points(result)
+
+
+@lru_cache(maxsize=AGGREGATE_CACHE_SIZE)
+def _handle_aggregate_closed(sensor_id: str, level: str, key: str, start_iso: str, end_iso: str, group_by: Optional[str], tzinfo) -> List[Dict[str, Any]]:
+    """
+    handle_aggregate s cache - jen pro úrovně z AGGREGATE_CACHED_LEVELS a období, které skončilo
+    aspoň před AGGREGATE_CLOSED_GRACE (výsledek se už nemůže změnit).
+    Vrácený list je sdílený mezi requesty → nemodifikovat.
+    """
+    return handle_aggregate(sensor_id, level, key, start_iso, end_iso, group_by, tzinfo)
 
 
 def api_aggregate(sensor_id: str, level: str, key: str, tzinfo) -> Tuple[Optional[int], Optional[str], Optional[List[Dict[str, Any]]], Optional[str], Optional[str], Optional[str]]:
@@ -180,7 +305,12 @@ def api_aggregate(sensor_id: str, level: str, key: str, tzinfo) -> Tuple[Optiona
         return 400, str(e), None, None, None, None
 
     try:
-        result = handle_aggregate(sensor_id, level, key, start_iso, end_iso, group_by, tzinfo)
+        # start/end jsou UTC ve formátu "%Y-%m-%d %H:%M:%S" -> lze porovnat přímo jako řetězce
+        closed_before_iso = to_sql_datetime(datetime.now(timezone.utc) - AGGREGATE_CLOSED_GRACE)
+        if level in AGGREGATE_CACHED_LEVELS and end_iso <= closed_before_iso:
+            result = _handle_aggregate_closed(sensor_id, level, key, start_iso, end_iso, group_by, tzinfo)
+        else:
+            result = handle_aggregate(sensor_id, level, key, start_iso, end_iso, group_by, tzinfo)
     except Exception as e:
         return 500, str(e), None, start_iso, end_iso, group_by
 
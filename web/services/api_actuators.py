@@ -3,6 +3,8 @@ API endpoints for actuators and logs
 ------------------------------------
 """
 
+import mmap
+from collections import deque
 from pathlib import Path
 from actuators.manager import ActuatorManager
 import logging
@@ -15,18 +17,21 @@ from services.api_utils import (
 
 logger = logging.getLogger("api")
 
+LOG_TAIL_BLOCK_SIZE = 64 * 1024  # čtení logu po blocích (záložní cesta, když nejde mmap)
+
 
 def api_read_led(act: ActuatorManager, sensor_id: str, query):
     actor_name = f"led_{sensor_id}"
-    try:
-        result = act.get_actor_states(actor_name)
-        return make_api_response(query, result=result, status=200, log=True)
-    except KeyError as ex:
-        return make_api_response_error(query, str(ex), status=404)
+    if actor_name not in act.valid_actors:
+        return make_api_response_error(query, f"Unknown actor {actor_name}", status=404)
+    result = act.get_actor_states(actor_name)
+    return make_api_response(query, result=result, status=200, log=True)
 
 
 def api_write_led(act: ActuatorManager, sensor_id: str, request, query):
     actor_name = f"led_{sensor_id}"
+    if actor_name not in act.valid_actors:
+        return make_api_response_error(query, f"Unknown actor {actor_name}", status=400)
     try:
         data = request.get_json(force=True)
         on = bool(data.get("on"))
@@ -40,17 +45,17 @@ def api_write_led(act: ActuatorManager, sensor_id: str, request, query):
 
 def api_read_relay(act: ActuatorManager, sensor_id: str, query):
     actor_name = f"relay_{sensor_id}"
-    try:
-        result = act.get_actor_states(actor_name)
-        # doplníme režim relé přímo do výsledku
-        result["mode"] = act.get_relay_mode(sensor_id)
-        return make_api_response(query, result=result, status=200, log=True)
-    except KeyError as ex:
-        return make_api_response_error(query, str(ex), status=404)
+    if actor_name not in act.valid_actors:
+        return make_api_response_error(query, f"Unknown actor {actor_name}", status=404)
+    # stav i režim relé jedním voláním
+    result = act.get_actor_full_state(actor_name)
+    return make_api_response(query, result=result, status=200, log=True)
 
 
 def api_write_relay(act: ActuatorManager, sensor_id: str, request, query):
     actor_name = f"relay_{sensor_id}"
+    if actor_name not in act.valid_actors:
+        return make_api_response_error(query, f"Unknown actor {actor_name}", status=400)
     try:
         data = request.get_json(force=True)
         mode = data.get("mode")
@@ -58,8 +63,7 @@ def api_write_relay(act: ActuatorManager, sensor_id: str, request, query):
             act.set_actor(actor_name, mode == "on")
         act.set_relay_mode(sensor_id, mode)
         logger.info("Změna relé: %s (sensor=%s)", data, sensor_id)
-        result = act.get_actor_states(actor_name)
-        result["mode"] = act.get_relay_mode(sensor_id)
+        result = act.get_actor_full_state(actor_name)
         return make_api_response(query, result=result, status=200, log=True)
     except Exception as ex:
         return make_api_response_error(query, str(ex), status=400)
@@ -84,39 +88,52 @@ def api_write_setpoint(act: ActuatorManager, sensor_id: str, request, query):
         return make_api_response_error(query, str(ex), status=400)
 
 
+def _tail_lines_mmap(f, filesize: int, max_lines_count: int) -> List[bytes]:
+    # soubor namapujeme do paměti a od konce hledáme začátek posledních max_lines_count řádků;
+    # kopírujeme a dělíme jen ten konec souboru
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = filesize - 1 if mm[filesize - 1] == 0x0A else filesize  # koncový \n neotvírá nový řádek
+        for _ in range(max_lines_count):
+            pos = mm.rfind(b"\n", 0, pos)
+            if pos < 0:
+                break
+        return mm[pos + 1:].splitlines()
+
+
+def _tail_lines_blocks(f, filesize: int, max_lines_count: int) -> List[bytes]:
+    # čteme od konce po blocích, jen počítáme \n; bloky spojíme a rozdělíme na řádky jednou na konci
+    chunks: deque = deque()
+    newline_count = 0
+    while filesize > 0 and newline_count <= max_lines_count:
+        size = min(LOG_TAIL_BLOCK_SIZE, filesize)
+        filesize -= size
+        f.seek(filesize)
+        chunk = f.read(size)
+        chunks.appendleft(chunk)
+        newline_count += chunk.count(b"\n")
+    return b"".join(chunks).splitlines()
+
+
 def get_logs_data(LOG_FILE: str, max_lines_count: int) -> Dict[str, Any]:
     if not Path(LOG_FILE).exists():
         return {"lines": [], "info": "Log file not found"}
 
     lines: List[bytes] = []
     with Path(LOG_FILE).open("rb") as f:
-        f.seek(0, 2)
-        filesize = f.tell()
-        block_size = 1024
-        data = b""
-        blocks = -1
-        while len(lines) <= max_lines_count and filesize > 0:
-            if (filesize - block_size) > 0:
-                f.seek(blocks * block_size, 2)
-                chunk = f.read(block_size)
-            else:
-                f.seek(0, 0)
-                chunk = f.read(filesize)
-            data = chunk + data
-            lines = data.splitlines()
-            filesize -= block_size
-            blocks -= 1
-            if filesize <= 0:
-                break
-
-    decoded: List[str] = []
-    for b in lines[-max_lines_count:]:
-        try:
-            decoded.append(b.decode("utf-8", errors="replace"))
-        except Exception:
-            decoded.append(b.decode("latin-1", errors="replace"))
-
-    return {"lines": decoded}
+        filesize = f.seek(0, 2)
+        if filesize > 0:
+            try:
+                lines = _tail_lines_mmap(f, filesize, max_lines_count)
+            except (OSError, ValueError):
+                # soubor nejde namapovat (např. speciální FS) -> čteme po blocích
+                lines = _tail_lines_blocks(f, filesize, max_lines_count)
+
+    lines = lines[-max_lines_count:]
+    if not lines:
+        return {"lines": []}
+    # jedno dekódování celého konce (errors="replace" nevyhazuje); spojujeme a dělíme jen podle \n,
+    # takže hranice řádků zůstanou stejné jako u bytes.splitlines() (str.splitlines dělí i podle \x0c, \u2028...)
+    return {"lines": b"\n".join(lines).decode("utf-8", errors="replace").split("\n")}
 
 
 def api_get_logs(LOG_FILE: str, max_lines_count: int):
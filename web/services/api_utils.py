@@ -23,15 +23,21 @@ Hlavní rozhraní:
 
 Výstupní formát odpovědí:
 Tuple(Response, int) → Flask Response objekt a HTTP status code.
+
+Poznámka:
+- query dicty (kromě agregace) jsou cachované (lru_cache) a sdílené mezi requesty → nemodifikovat.
 """
 
 from flask import Response, jsonify
 from typing import Optional, Any, Tuple, Dict
+from itertools import islice
+from functools import lru_cache
 import logging
 
 logger = logging.getLogger("api")
 
 
+@lru_cache(maxsize=1)
 def getQueryLogsTail() -> Dict[str, str]:
     """
     Vrátí metadata pro dotaz na logy (tail).
@@ -39,6 +45,7 @@ def getQueryLogsTail() -> Dict[str, str]:
     return {"route": "/api/logs/tail", "method": "GET"}
 
 
+@lru_cache(maxsize=1)
 def getQueryDataSensors() -> Dict[str, str]:
     """
     Vrátí metadata pro dotaz na seznam senzorů.
@@ -46,6 +53,7 @@ def getQueryDataSensors() -> Dict[str, str]:
     return {"route": "/api/sensors", "method": "GET"}
 
 
+@lru_cache(maxsize=64)
 def getQueryDataLatest(sensor_id: str) -> Dict[str, Any]:
     """
     Vrátí metadata pro dotaz na poslední data konkrétního senzoru.
@@ -59,6 +67,15 @@ def getQueryDataLatest(sensor_id: str) -> Dict[str, Any]:
     return {"route": "/api/latest/<sensor_id>", "method": "GET", "sensor_id": sensor_id}
 
 
+@lru_cache(maxsize=64)
+def _resolved_tz_name(tzinfo: Any) -> str:
+    """
+    Vrátí čitelný název časové zóny (ZoneInfo.key nebo str(tzinfo)).
+    Výsledek je cachovaný - tzinfo objekty se mezi requesty opakují.
+    """
+    return getattr(tzinfo, "key", None) or str(tzinfo)
+
+
 def getQueryDataAggregate(sensor_id: str, level: str, key: str,
                           tz_name: str, tz_offset: str,
                           tzinfo: Optional[Any] = None,
@@ -89,12 +106,13 @@ def getQueryDataAggregate(sensor_id: str, level: str, key: str,
         "key": key,
         "tz": tz_name,
         "tz_offset": tz_offset,
-        "resolved_tz": None if tzinfo is None else getattr(tzinfo, "key", None) or str(tzinfo),
+        "resolved_tz": None if tzinfo is None else _resolved_tz_name(tzinfo),
         "start_utc": start_iso,
         "end_utc": end_iso,
         "group_by": group_by,
     }
 
+@lru_cache(maxsize=64)
 def getQueryLed(sensor_id: str, method: str = "GET") -> Dict[str, Any]:
     """
     Metadata pro dotaz na LED aktuátor.
@@ -105,6 +123,7 @@ def getQueryLed(sensor_id: str, method: str = "GET") -> Dict[str, Any]:
         "method": method,
     }
 
+@lru_cache(maxsize=64)
 def getQueryRelay(sensor_id: str, method: str = "GET") -> Dict[str, Any]:
     """
     Metadata pro dotaz na relé aktuátor.
@@ -115,6 +134,7 @@ def getQueryRelay(sensor_id: str, method: str = "GET") -> Dict[str, Any]:
         "method": method,
     }
 
+@lru_cache(maxsize=64)
 def getQueryRelaySetpoint(sensor_id: str, method: str = "GET") -> Dict[str, Any]:
     """
     Metadata pro dotaz na setpoint relé aktuátoru.
@@ -125,37 +145,35 @@ def getQueryRelaySetpoint(sensor_id: str, method: str = "GET") -> Dict[str, Any]
         "method": method,
     }
 
-def getQueryLogsTail() -> Dict[str, str]:
-    return {"route": "/api/logs/tail", "method": "GET"}
-
 def log_data(key: str, num: int | bool, data: Any) -> None:
     """
     Ladicí logování dat (result/error).
     Pokud je data list, vypíše prvních num položek a vždy i poslední záznam.
+    Pokud je num nepravdivé nebo DEBUG úroveň vypnutá, nedělá nic (nic se neformátuje).
 
     Parametry:
     - key: název logované položky
     - num: počet položek nebo True pro všechny
     - data: logovaná data
     """
-    if isinstance(data, list):
-        max_items = None if num is True else int(num)
-        last_index = len(data) - 1
-        useBreak = False
-        for count, item in enumerate(data, start=1):
-            suffix = ""
-            # pokud jsme přes limit, přidáme "..." a ukončíme cyklus
-            if max_items is not None and count >= max_items:
-                suffix = "  ..."
-                useBreak = True
-            logger.debug(f"      {key}[]{item}{suffix}")
-            if useBreak:
-                break                
-        # vždy zalogujeme poslední záznam, pokud není už zahrnut
-        if last_index >= 0 and (max_items is None or last_index >= max_items):
-            logger.debug(f"      {key}[]{data[-1]}{'  last'}")
-    else:
-        logger.debug(f"      {key}{data}")
+    if not num or not logger.isEnabledFor(logging.DEBUG):
+        return
+    if not isinstance(data, list):
+        logger.debug("      %s%s", key, data)
+        return
+
+    if num is True:
+        for item in data:
+            logger.debug("      %s[]%s", key, item)
+        return
+
+    max_items = int(num)
+    # u posledni vypsane polozky (pokud jsme na limitu) pridame "..."
+    for count, item in enumerate(islice(data, max_items), start=1):
+        logger.debug("      %s[]%s%s", key, item, "  ..." if count >= max_items else "")
+    # vždy zalogujeme poslední záznam, pokud není už zahrnut
+    if len(data) > max_items:
+        logger.debug("      %s[]%s  last", key, data[-1])
 
 
 def make_api_response(query: Dict[str, Any],
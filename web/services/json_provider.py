@@ -0,0 +1,75 @@
+# services/json_provider.py
+"""
+JSON provider
+-------------
+
+Účel:
+- Nahrazuje výchozí Flask JSON provider (stdlib json) rychlejším orjson (C extension).
+- Serializace velkých odpovědí (např. /api/aggregate) je tak výrazně rychlejší.
+- orjson je volitelný; pokud není nainstalovaný, Flask používá svůj DefaultJSONProvider.
+
+Závislosti:
+- flask.json.provider.DefaultJSONProvider (základ, fallback pro nepodporované typy)
+- orjson (volitelně)
+
+Hlavní rozhraní:
+- `OrjsonProvider` → JSON provider kompatibilní s `app.json`
+- `install_json_provider(app)` → nastaví OrjsonProvider, pokud je orjson dostupný
+
+Kompatibilita s DefaultJSONProvider:
+- zachovává řazení klíčů (sort_keys) i odsazení v debug režimu
+- `response()` (tj. jsonify) skládá tělo odpovědi rovnou z bytes od orjson, bez převodu přes str
+- datetime/date, Decimal, UUID, dataclass předává do `default` → stejný výstup jako Flask
+"""
+
+from typing import Any
+from flask import Flask, Response
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider postavený na orjson.
+    Typy, které orjson neumí (nebo je Flask serializuje jinak), předává do `self.default`.
+    """
+
+    def _dumps_bytes(self, obj: Any, **kwargs: Any) -> bytes:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=kwargs.get("default", self.default), option=option)
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return self._dumps_bytes(obj, **kwargs).decode()
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        """
+        Stejné chování jako DefaultJSONProvider.response (jsonify), ale tělo jsou přímo bytes z orjson.
+        """
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = self._dumps_bytes(obj, indent=indent) + b"\n"
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+
+def install_json_provider(app: Flask) -> bool:
+    """
+    Nastaví aplikaci OrjsonProvider, pokud je orjson dostupný.
+
+    Návratová hodnota:
+    - True pokud byl provider nastaven, jinak False (zůstává výchozí Flask provider)
+    """
+    if orjson is None:
+        return False
+    app.json = OrjsonProvider(app)
+    return True
@@ -19,6 +19,7 @@ Hlavní rozhraní:
 - parse_local_iso() → převede ISO string na datetime s daným tzinfo
 - to_utc() → převede lokální datetime na UTC
 - to_local_iso_from_utc() → převede UTC datetime na lokální ISO string
+- to_sql_datetime() → datetime jako "YYYY-MM-DD HH:MM:SS" pro SQLite WHERE
 - parse_local_key_to_range() → vrací časový interval a group_by pattern pro agregace
 
 Výstupní formáty:
@@ -30,6 +31,7 @@ from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 import re
 import logging
+from functools import lru_cache
 from typing import Optional, Tuple, Union
 
 logger = logging.getLogger("time_utils")
@@ -37,9 +39,11 @@ logger = logging.getLogger("time_utils")
 ISO_FORMAT = "%Y-%m-%dT%H:%M:%S"
 
 
+@lru_cache(maxsize=64)
 def resolve_tz(tz_name: Optional[str], tz_offset: Optional[str]) -> timezone:
     """
     Vrátí timezone objekt podle názvu nebo offsetu.
+    Výsledek je cachovaný - prohlížeč posílá stále stejnou dvojici (tz_name, tz_offset).
 
     Parametry:
     - tz_name: název časové zóny (např. "Europe/Prague") nebo None
@@ -69,6 +73,27 @@ def _is_tz_aware_str(txt: str) -> bool:
     return bool(re.search(r'(Z|[+\-]\d{2}(:\d{2})?)$', txt))
 
 
+def _parse_naive_fast(txt: str) -> Optional[datetime]:
+    """
+    Rychlý převod obvyklých tvarů klíče podle délky řetězce (bez zkoušení strptime formátů):
+    19 "YYYY-MM-DDTHH:MM:SS", 16 "YYYY-MM-DDTHH:MM", 10 "YYYY-MM-DD" → datetime.fromisoformat,
+    7 "YYYY-MM" a 4 "YYYY" → datetime(int(...), ...) ze slice.
+    Neznámý nebo neplatný tvar → None (parse_local_iso pak zkusí strptime formáty).
+    """
+    n = len(txt)
+    try:
+        if n in (19, 16, 10) and txt[4] == "-" and txt[7] == "-" and (n == 10 or txt[10] == "T"):
+            naive = datetime.fromisoformat(txt)
+            return naive if naive.tzinfo is None else None
+        if n == 7 and txt[4] == "-" and txt[:4].isdigit() and txt[5:].isdigit():
+            return datetime(int(txt[:4]), int(txt[5:]), 1)
+        if n == 4 and txt.isdigit():
+            return datetime(int(txt), 1, 1)
+    except ValueError:
+        pass
+    return None
+
+
 def parse_local_iso(local_iso: str, tzinfo: timezone) -> datetime:
     """
     Převede ISO string (lokální nebo tz-aware) na datetime s daným tzinfo.
@@ -82,6 +107,11 @@ def parse_local_iso(local_iso: str, tzinfo: timezone) -> datetime:
     """
     txt = str(local_iso).replace(" ", "T")
 
+    # 0) obvyklé lokální tvary podle délky (bez strptime); tz-aware vstup vrací None
+    naive = _parse_naive_fast(txt)
+    if naive is not None:
+        return naive.replace(tzinfo=tzinfo)
+
     # 1) tz-aware input (Z or ±HH[:MM])
     if _is_tz_aware_str(txt):
         try:
@@ -123,6 +153,14 @@ def to_utc(dt_local: datetime) -> datetime:
     return dt_local.astimezone(timezone.utc)
 
 
+def to_sql_datetime(dt: datetime) -> str:
+    """
+    Naformátuje datetime jako "YYYY-MM-DD HH:MM:SS" (tvar sloupce timestamp v SQLite), zóna se nevypisuje.
+    Stejný výstup jako dt.strftime("%Y-%m-%d %H:%M:%S"), jen bez interpretace formátovacího řetězce.
+    """
+    return f"{dt.year:04d}-{dt.month:02d}-{dt.day:02d} {dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}"
+
+
 def to_local_iso_from_utc(utc_dt: datetime, tzinfo: Union[datetime.tzinfo, ZoneInfo]) -> str:
     """
     Převede UTC datetime na lokální ISO string s offsetem.
@@ -152,9 +190,8 @@ def shorten_key_by_level(level: str, key: str) -> str:
     Returns:
     - shortened key (e.g. "2025-11" for monthly)
     """
-    print("Shorten key input1:", level, key)
     key = key.replace("T", " ")
-    print("Shorten key input2:", level, key)
+    logger.debug("shorten_key_by_level input: level=%s key=%s", level, key)
     if level == "monthly":
         return key[:4]              # "YYYY"
     elif level == "daily":
@@ -219,7 +256,7 @@ def parse_local_key_to_range(level: str, key: str, tzinfo: timezone) -> Tuple[st
     else:
         raise ValueError(f"Unsupported level: {level}")
 
-    start_iso = to_utc(start_local).strftime("%Y-%m-%d %H:%M:%S")
-    end_iso = to_utc(end_local).strftime("%Y-%m-%d %H:%M:%S")
+    start_iso = to_sql_datetime(to_utc(start_local))
+    end_iso = to_sql_datetime(to_utc(end_local))
     logger.debug("parse_local_key_to_range output: level=%s start=%s end=%s", level, start_iso, end_iso)
     return start_iso, end_iso, group_by